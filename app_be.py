@@ -267,6 +267,7 @@ class TeZ_App_BE:
         self.diu.live_df_ctrl = app_mods.Ctrl.OFF
         logger.debug ('Cancelling all waiting orders')
         self.pfmu.cancel_all_waiting_orders (exit_flag=True, show_table=False)
+        self.pfmu.close()
         self.pfmu.show()
 
     @staticmethod
@@ -42,6 +42,8 @@ except Exception as e:
     logger.error(("Import Error " + str(e)))
     sys.exit(1)
 
+_CONSOLE = Console()
+
 @dataclass
 class BookKeeperUnitCreateConfig():
     rec_file:str
@@ -72,14 +74,13 @@ class BookKeeperUnit:
                 print(f'Renamed backup file to: {new_file_path}')
 
     def save_order(self, order_id, tsym_token, qty, order_time, status, oco_order_id):
-        new_order = pd.DataFrame({
-            'Order_ID': [order_id],
-            'TradingSymbol_Token': [tsym_token],
-            'Qty': [qty],
-            'Order_Time': [order_time],
-            'Status': [status],
-            'OCO_Alert_ID': [oco_order_id]
-        })
+        self.save_orders([(order_id, tsym_token, qty, order_time, status, oco_order_id)])
+
+    def save_orders(self, rows):
+        # rows: (order_id, tsym_token, qty, order_time, status, oco_order_id) tuples,
+        # appended and written to the record file in one go.
+        new_order = pd.DataFrame.from_records(rows, columns=['Order_ID', 'TradingSymbol_Token', 'Qty',
+                                                             'Order_Time', 'Status', 'OCO_Alert_ID'])
 
         new_order['Order_ID'] = new_order['Order_ID'].astype(object)
 
@@ -106,7 +107,6 @@ class BookKeeperUnit:
 
     def show(self):
         df = self.orders_df
-        console = Console()
         table = Table(title='Position Order - Records')
         table.add_column("#", justify="center")
 
@@ -115,10 +115,10 @@ class BookKeeperUnit:
             table.add_column(column, justify="center")
 
         # Add data rows
-        for i, (_, row) in enumerate(df.iterrows(), start=1):
-            table.add_row(str(i), *[str(value) for value in row.tolist()])
+        for i, row in enumerate(df.itertuples(index=False, name=None), start=1):
+            table.add_row(str(i), *map(str, row))
 
-        console.print(table)
+        _CONSOLE.print(table)
 
     def fetch_order_id(self):
         if len(self.orders_df):
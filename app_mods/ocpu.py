@@ -28,17 +28,16 @@ from app_utils import app_logger
 logger = app_logger.get_logger(__name__)
 
 try:
-    import copy
     import json
+    import logging
     import math
     from datetime import datetime
     from threading import Lock
     from typing import NamedTuple
 
     import app_utils as utils
-    import numpy as np
 
-    from . import Diu, Tiu, Tiu_OrderStatus, shared_classes
+    from . import Diu, Tiu, shared_classes
 
 except Exception as e:
     logger.debug(traceback.format_exc())
@@ -46,6 +45,24 @@ except Exception as e:
     sys.exit(1)
 
 
+# NSE ETFs traded directly as equity instead of through options.
+_NSE_EQUITY_SYMS = frozenset({'NIFTYBEES', 'BANKBEES'})
+
+
+def _build_orders(ctor, leg_qtys, qty, **common_kwargs):
+    # Each leg is constructed and labelled in the same pass. remarks is
+    # set after construction, not passed in, so that the OCO follow-up
+    # of Combi orders stays unlabelled; tiu labels it with the primary
+    # order id once that is known.
+    orders = []
+    qty_str = f'{qty:.0f}'
+    for i, leg_qty in enumerate(leg_qtys, start=1):
+        order = ctor(quantity=leg_qty, **common_kwargs)
+        order.remarks = f'TeZ_{i}_Qty_{leg_qty:.0f}_of_{qty_str}'
+        orders.append(order)
+    return orders
+
+
 class Ocpu_CreateConfig(NamedTuple):
     tiu: Tiu
     diu: Diu
@@ -59,182 +76,203 @@ class Ocpu_RetObject(NamedTuple):
 
 class OCPU(object):
     def __init__(self, ocpu_cc: Ocpu_CreateConfig):
+        # Guards only in-memory OCPU state. Never hold it across tiu/diu calls,
+        # as those are broker round trips and would serialize every order.
         self.lock = Lock()
         self.tiu = ocpu_cc.tiu
         self.diu = ocpu_cc.diu
-
-    def create_order(self, action: str, inst_info: shared_classes.InstrumentInfo, trade_price: float = None):
-        def get_tsym_token(tiu: Tiu, diu: Diu, action: str, trade_price: float = None):
-            sym = inst_info.symbol
-            expiry_date = inst_info.expiry_date
-            ce_offset = inst_info.ce_strike_offset
-            pe_offset = inst_info.pe_strike_offset
-            qty = inst_info.quantity
-            exch = inst_info.exchange
-            ul_ltp = diu.get_latest_tick()
-            if trade_price is None:
-                use_u_ltp = ul_ltp
-            else:
-                use_u_ltp = trade_price
-            if exch == 'NFO':
-                # find the nearest strike price
-                strike_diff = inst_info.strike_diff
-                strike1 = int(math.floor(use_u_ltp / strike_diff) * strike_diff)
-                strike2 = int(math.ceil(use_u_ltp / strike_diff) * strike_diff)
-                strike = strike1 if abs(use_u_ltp - strike1) < abs(use_u_ltp - strike2) else strike2
-                logger.debug(f'strike1: {strike1} strike2: {strike2} strike: {strike}')
-                c_or_p = 'C' if action == 'Buy' else 'P'
-
-                if c_or_p == 'C':
-                    strike_offset = ce_offset
-                else:
-                    strike_offset = pe_offset
-
-                strike += int(strike_offset * strike_diff)
-
-                if action == 'Buy' and inst_info.ce_strike is not None:
-                    strike = inst_info.ce_strike
-                if action == 'Short' and inst_info.pe_strike is not None:
-                    strike = inst_info.pe_strike
-                
-                # expiry_date = app_mods.get_system_info("TIU", "EXPIRY_DATE")
+        # LCM of (lot size, freeze qty - 1); both only change on a contract roll.
+        self._lcm_cache: dict[tuple[int, int], int] = {}
+        # (symbol, expiry as configured '%d-%b-%Y') -> search text prefix, e.g. 'NIFTY28MAR24'
+        self._sym_exp_cache: dict[tuple[str, str], str] = {}
+        # (exchange, search text) -> (token, tsym, freeze qty or None)
+        self._scrip_cache: dict[tuple[str, str], tuple] = {}
+
+    def _get_tsym_token(self, tiu: Tiu, diu: Diu, action: str, inst_info: shared_classes.InstrumentInfo, trade_price: float = None):
+        # json.dumps of broker responses is costly; only build it when it will be logged.
+        dbg = logger.isEnabledFor(logging.DEBUG)
+        order_prod_type = inst_info.order_prod_type
+        sym = inst_info.symbol
+        expiry_date = inst_info.expiry_date
+        ce_offset = inst_info.ce_strike_offset
+        pe_offset = inst_info.pe_strike_offset
+        qty = inst_info.quantity
+        exch = inst_info.exchange
+        ul_ltp = diu.get_latest_tick()
+        if trade_price is None:
+            use_u_ltp = ul_ltp
+        else:
+            use_u_ltp = trade_price
+        if exch == 'NFO':
+            # find the nearest strike price
+            strike_diff = inst_info.strike_diff
+            ce_strike, pe_strike = inst_info.ce_strike, inst_info.pe_strike
+            # Round half up to the strike grid; a tie picks the higher strike.
+            strike = int((use_u_ltp + strike_diff * 0.5) // strike_diff * strike_diff)
+            logger.debug('use_u_ltp: %s strike_diff: %s strike: %s', use_u_ltp, strike_diff, strike)
+            c_or_p, strike_offset = ('C', ce_offset) if action == 'Buy' else ('P', pe_offset)
+            strike += int(strike_offset * strike_diff)
+
+            if action == 'Buy' and ce_strike is not None:
+                strike = ce_strike
+            if action == 'Short' and pe_strike is not None:
+                strike = pe_strike
+
+            # expiry_date = app_mods.get_system_info("TIU", "EXPIRY_DATE")
+            sym_exp = self._sym_exp_cache.get((sym, expiry_date))
+            if sym_exp is None:
                 parsed_date = datetime.strptime(expiry_date, '%d-%b-%Y')
-                exp_date = parsed_date.strftime('%d%b%y')
-                searchtext = f'{sym}{exp_date}{c_or_p}{strike:.0f}'
-            elif exch == 'NSE':
-                searchtext = sym
-                strike = None
-                logger.debug(f'ul_ltp:{ul_ltp} strike:{strike}')
-            else:
-                ...
+                sym_exp = self._sym_exp_cache[(sym, expiry_date)] = f"{sym}{parsed_date.strftime('%d%b%y')}"
+            searchtext = f'{sym_exp}{c_or_p}{strike:.0f}'
+        elif exch == 'NSE':
+            searchtext = sym
+            strike = None
+            logger.debug('ul_ltp:%s strike:%s', ul_ltp, strike)
+        else:
+            ...
 
-            logger.debug(f'exch: {exch} searchtext: {searchtext}')
+        logger.debug('exch: %s searchtext: %s', exch, searchtext)
+        # token, tsym and freeze qty of a contract do not change within a session;
+        # only the ltp needs to be fetched for every order.
+        scrip = self._scrip_cache.get((exch, searchtext))
+        if scrip is None:
             token, tsym = tiu.search_scrip(exchange=exch, symbol=searchtext)
 
             if not token and not tsym:
                 logger.error('Major error: Check Expiry date')
                 raise RuntimeError
 
-            ltp, ti, ls = tiu.fetch_ltp(exch, token)
+            r = tiu.get_security_info(exchange=exch, symbol=tsym, token=token)
+            if dbg:
+                logger.debug(f'{json.dumps(r, indent=2)}')
+
+            sec_frz_qty = int(r['frzqty']) if isinstance(r, dict) and 'frzqty' in r else None
+            scrip = (token, tsym, sec_frz_qty)
+            if isinstance(r, dict):
+                self._scrip_cache[(exch, searchtext)] = scrip
+        token, tsym, sec_frz_qty = scrip
 
+        ltp, ti, ls = tiu.fetch_ltp(exch, token)
+
+        if ls is None or ti is None or ltp is None:
+            ltp, ti, ls = diu.fetch_ltp(exch, token)
             if ls is None or ti is None or ltp is None:
-                ltp, ti, ls = diu.fetch_ltp(exch, token)
-                if ls is None or ti is None or ltp is None:
-                    logger.error(f'Major Issue..Exit and Take manual control {token}')
-                    raise RuntimeError
+                logger.error(f'Major Issue..Exit and Take manual control {token}')
+                raise RuntimeError
 
-            qty = qty * ls
+        qty = qty * ls
 
-            r = tiu.get_security_info(exchange=exch, symbol=tsym, token=token)
-            logger.debug(f'{json.dumps(r, indent=2)}')
+        if sec_frz_qty is not None:
+            frz_qty = sec_frz_qty
+        else:
+            frz_qty = qty + 1
 
-            if isinstance(r, dict) and 'frzqty' in r:
-                frz_qty = int(r['frzqty'])
-            else:
-                frz_qty = qty + 1
-
-            # Ideally, for breakout orders need to use the margin available
-            # For option buying it is cash availablity.
-            # To keep it simple, using available cash for both.
-            
-            if exch == 'NFO':
-                buy_or_sell = 'B'
-            else:
-                buy_or_sell = 'B' if action == 'Buy' else 'S'
+        # Ideally, for breakout orders need to use the margin available
+        # For option buying it is cash availablity.
+        # To keep it simple, using available cash for both.
 
-            prod_type = 'I' if inst_info.order_prod_type == 'O' else inst_info.order_prod_type
+        if exch == 'NFO':
+            buy_or_sell = 'B'
+        else:
+            buy_or_sell = 'B' if action == 'Buy' else 'S'
 
-            def find_optimum_qty(initial_qty, ls):
-                # Check if initial_qty results in "Order Success"
-                initial_qty = (initial_qty // ls) * ls
-                
+        prod_type = 'I' if order_prod_type == 'O' else order_prod_type
+
+        def find_optimum_qty(initial_qty, ls):
+            # Check if initial_qty results in "Order Success"
+            initial_qty = (initial_qty // ls) * ls
+
+            try:
+                r = tiu.get_order_margin(buy_or_sell=buy_or_sell, exchange=exch,
+                                            product_type=prod_type, tradingsymbol=tsym, 
+                                            quantity=initial_qty, price_type='MKT', price=0.0)
+            except Exception as e:
+                logger.error (f'Exception occured {repr(e)}')
+                return None
+            else:
+                if dbg:
+                    logger.debug (f"qty: {initial_qty} {json.dumps(r, indent=2)}")
+                if r and r['stat'] == 'Ok' and ((r['remarks'] == "Order Success") or (r['remarks'] == 'Squareoff Order')):
+                    return initial_qty
+
+            qty = initial_qty
+            itrn_cnt = 0
+            while True:
+                itrn_cnt += 1
                 try:
                     r = tiu.get_order_margin(buy_or_sell=buy_or_sell, exchange=exch,
                                                 product_type=prod_type, tradingsymbol=tsym, 
-                                                quantity=initial_qty, price_type='MKT', price=0.0)
+                                                quantity=qty, price_type='MKT', price=0.0)
                 except Exception as e:
                     logger.error (f'Exception occured {repr(e)}')
                     return None
                 else:
-                    logger.debug (f"qty: {initial_qty} {json.dumps(r, indent=2)}")
-                    if r and r['stat'] == 'Ok' and ((r['remarks'] == "Order Success") or (r['remarks'] == 'Squareoff Order')):
-                        return initial_qty
-
-                qty = initial_qty
-                itrn_cnt = 0
-                while True:
-                    itrn_cnt += 1
-                    try:
-                        r = tiu.get_order_margin(buy_or_sell=buy_or_sell, exchange=exch,
-                                                    product_type=prod_type, tradingsymbol=tsym, 
-                                                    quantity=qty, price_type='MKT', price=0.0)
-                    except Exception as e:
-                        logger.error (f'Exception occured {repr(e)}')
-                        return None
-                    else:
+                    if dbg:
                         logger.debug (f"itrn_cnt: {itrn_cnt} qty: {qty} {json.dumps(r, indent=2)}")
-                        if r and r['stat'] == 'Ok' and ((r['remarks'] == "Order Success") or (r['remarks'] == 'Squareoff Order')):
-                            break
-                    qty //= 2
-                    if not qty:
+                    if r and r['stat'] == 'Ok' and ((r['remarks'] == "Order Success") or (r['remarks'] == 'Squareoff Order')):
                         break
-                
+                qty //= 2
                 if not qty:
-                    return qty
-
-                low = qty
-                high = ((qty * 2) // ls) * ls
-                logger.debug (f'qty:{qty} low:{low} high:{high}')
-                itrn_cnt = 0
-                while low <= high:
-                    itrn_cnt += 1
-                    mid = ((low + high) // 2 // ls) * ls	
-                    try:
-                        r = tiu.get_order_margin(buy_or_sell=buy_or_sell, exchange=exch,
-                                                    product_type=prod_type, tradingsymbol=tsym, 
-                                                    quantity=mid, price_type='MKT', price=0.0)
-                    except Exception as e:
-                        logger.error (f'Exception occured {repr(e)}')
-                        return None
-                    else:
+                    break
+
+            if not qty:
+                return qty
+
+            low = qty
+            high = ((qty * 2) // ls) * ls
+            logger.debug ('qty:%s low:%s high:%s', qty, low, high)
+            itrn_cnt = 0
+            while low <= high:
+                itrn_cnt += 1
+                mid = ((low + high) // 2 // ls) * ls	
+                try:
+                    r = tiu.get_order_margin(buy_or_sell=buy_or_sell, exchange=exch,
+                                                product_type=prod_type, tradingsymbol=tsym, 
+                                                quantity=mid, price_type='MKT', price=0.0)
+                except Exception as e:
+                    logger.error (f'Exception occured {repr(e)}')
+                    return None
+                else:
+                    if dbg:
                         logger.debug (f"itrn_cnt: {itrn_cnt} qty: {mid} {json.dumps(r, indent=2)}")
-                        if r and r['stat'] == 'Ok' :
-                            if ((r['remarks'] == "Order Success") or (r['remarks'] == 'Squareoff Order')):
-                                low = mid + ls
-                            else:
-                                high = mid - ls
-                return high            
-
-            qty_within_margin = find_optimum_qty (qty, ls)
-            logger.debug (f'qty_within_margin: {qty_within_margin}')
-            if qty_within_margin:
-                qty = int(qty_within_margin / ls) * ls  # Doubly Ensuring qty is a multiple of lot size
-            else :
-                margin = self.tiu.avlble_margin
-                if margin < (ltp * 1.1 * qty):
-                    old_qty = qty
-                    qty = math.floor(margin / (1.1 * ltp))  # 10% buffer
-                    qty = int(qty / ls) * ls  # Important as above value will not be a multiple of lot
-                    logger.info(f'Available Margin: {self.tiu.avlble_margin:.2f} Required Amount: {ltp * old_qty} Updating qty: {old_qty} --> {qty} ')
-
-            logger.debug(f'''strike: {strike}, sym: {sym}, tsym: {tsym}, token: {token},
-                    qty:{qty}, ul_ltp:{ul_ltp}, ltp: {ltp}, ti:{ti} ls:{ls} frz_qty: {frz_qty}''')
-
-            return strike, sym, tsym, token, qty, ul_ltp, ltp, ti, frz_qty, ls
+                    if r and r['stat'] == 'Ok' :
+                        if ((r['remarks'] == "Order Success") or (r['remarks'] == 'Squareoff Order')):
+                            low = mid + ls
+                        else:
+                            high = mid - ls
+            return high            
+
+        qty_within_margin = find_optimum_qty (qty, ls)
+        logger.debug ('qty_within_margin: %s', qty_within_margin)
+        if qty_within_margin:
+            qty = int(qty_within_margin / ls) * ls  # Doubly Ensuring qty is a multiple of lot size
+        else :
+            margin = tiu.avlble_margin
+            unit_cost = 1.1 * ltp  # 10% buffer
+            if margin < (unit_cost * qty):
+                old_qty = qty
+                qty = math.floor(margin / unit_cost)
+                qty = int(qty / ls) * ls  # Important as above value will not be a multiple of lot
+                logger.info(f'Available Margin: {margin:.2f} Required Amount: {ltp * old_qty} Updating qty: {old_qty} --> {qty} ')
+
+        logger.debug('''strike: %s, sym: %s, tsym: %s, token: %s,
+                qty:%s, ul_ltp:%s, ltp: %s, ti:%s ls:%s frz_qty: %s''',
+                     strike, sym, tsym, token, qty, ul_ltp, ltp, ti, ls, frz_qty)
+
+        return strike, sym, tsym, token, qty, ul_ltp, ltp, ti, frz_qty, ls
+
+    def create_order(self, action: str, inst_info: shared_classes.InstrumentInfo, trade_price: float = None):
+        order_prod_type = inst_info.order_prod_type
 
         ul_ltp = tsym_token = orders = None
         try:
-            strike, sym, tsym, token, qty, ul_ltp, ltp, ti, frz_qty, ls = get_tsym_token(self.tiu, self.diu, action=action, trade_price=trade_price)
+            strike, sym, tsym, token, qty, ul_ltp, ltp, ti, frz_qty, ls = self._get_tsym_token(self.tiu, self.diu, action=action, inst_info=inst_info, trade_price=trade_price)
         except RuntimeError:
             raise
         except Exception as e:
             logger.error(f'Exception occured {e}')
             raise
         else:
-            oco_order = np.nan
-            os = shared_classes.OrderStatus()
-            status = Tiu_OrderStatus.HARD_FAILURE
-
             given_nlegs = inst_info.n_legs
 
             if qty and given_nlegs:
@@ -249,36 +287,25 @@ class OCPU(object):
                 # determine optimum no. of nlegs, per_leg_qty and residual qty.
                 #
 
-                def lcm(x, y):
-                    """Compute the least common multiple of x and y."""
-                    return x * y // math.gcd(x, y)
-
-                def find_nearest_lcm(lotsize, freezeqty, qty):
-
-
-                    """Find the nearest LCM of lotsize and freezeqty that is less than qty."""
-                    # Calculate the LCM of lotsize and freezeqty
-                    lcm_value = lcm(int(lotsize), int(freezeqty))
-                    
-                    # Determine the nearest multiple of lcm_value less than qty
-                    nearest_multiple = (qty // lcm_value) * lcm_value
-
-                    return nearest_multiple
-
                 # Important: frz_qty is 1801 for nifty fno and not 1800 in finvasia api
                 if (qty / given_nlegs) < frz_qty:
                     nearest_lcm_qty = qty
-                    logger.debug(f'making nearest_lcm :{qty}')
+                    logger.debug('making nearest_lcm :%s', qty)
                 else:
-                    nearest_lcm_qty = find_nearest_lcm(ls, (frz_qty - 1), qty)
+                    # Nearest multiple of LCM(lot size, freeze qty) that is less than qty
+                    key = (int(ls), int(frz_qty - 1))
+                    lcm_value = self._lcm_cache.get(key)
+                    if lcm_value is None:
+                        lcm_value = self._lcm_cache[key] = math.lcm(*key)
+                    nearest_lcm_qty = (qty // lcm_value) * lcm_value
 
-                logger.debug(f"qty:{qty} Nearest LCM qty:{nearest_lcm_qty}")
+                logger.debug('qty:%s Nearest LCM qty:%s', qty, nearest_lcm_qty)
 
                 res_qty1 = qty - nearest_lcm_qty
                 min_legs = int(nearest_lcm_qty // (frz_qty - 1))  # Lower boundary
                 max_legs = int(nearest_lcm_qty // ls)           # Upper boundary
 
-                logger.debug(f"res_qty1: {res_qty1} min_legs: {min_legs} max_legs:{max_legs}")
+                logger.debug('res_qty1: %s min_legs: %s max_legs:%s', res_qty1, min_legs, max_legs)
 
                 if (min_legs == 0) and (max_legs == 0): #Special case
                     logger.info (f'Insufficient Balance : tsym:{tsym} ltp: {ltp}')
@@ -294,210 +321,84 @@ class OCPU(object):
 
                 nlegs = int(max(min(given_nlegs, max_legs), min_legs))
                 per_leg_qty = ((nearest_lcm_qty / nlegs) // ls) * ls
-                logger.debug(f'n_given_legs: {given_nlegs}, nlegs: {nlegs} per_leg_qty:{per_leg_qty}')
+                logger.debug('n_given_legs: %s, nlegs: %s per_leg_qty:%s', given_nlegs, nlegs, per_leg_qty)
 
                 res_qty2 = nearest_lcm_qty - (per_leg_qty * nlegs)
-                logger.debug(f'Verification: qty: {qty} final_qty: {((per_leg_qty*nlegs) + res_qty1 + res_qty2)}: {qty == ((per_leg_qty*nlegs) + res_qty1 + res_qty2)}')
+                final_qty = (per_leg_qty * nlegs) + res_qty1 + res_qty2
+                logger.debug('Verification: qty: %s final_qty: %s: %s', qty, final_qty, qty == final_qty)
 
                 res_qty = res_qty1 + res_qty2
                 rem_qty = (res_qty // ls) * ls
-                logger.debug(f'per_leg_qty: {per_leg_qty}, res_qty1:{res_qty1} res_qty2:{res_qty2} rem_qty:{rem_qty}')
+                logger.debug('per_leg_qty: %s, res_qty1:%s res_qty2:%s rem_qty:%s', per_leg_qty, res_qty1, res_qty2, rem_qty)
+
+                # Quantity of every leg, in the order the legs are built below.
+                leg_qtys = ([per_leg_qty] * nlegs if per_leg_qty else []) + ([rem_qty] if rem_qty else [])
             else:
                 logger.info(f'qty: {qty} given_nlegs: {given_nlegs} is not allowed')
                 return
 
-            logger.debug(f'sym:{sym} tsym:{tsym} ltp: {ltp}')
+            logger.debug('sym:%s tsym:%s ltp: %s', sym, tsym, ltp)
 
-            use_gtt_oco = True if inst_info.order_prod_type == 'O' else False
-            remarks = None
-
-            orders = []
-            if (sym == 'NIFTYBEES' or sym == 'BANKBEES') and ltp is not None:
-                if inst_info.order_prod_type == 'I':
-                    if per_leg_qty:
-                        if action == 'Buy':
-                            order = shared_classes.I_B_MKT_Order(tradingsymbol=tsym, quantity=per_leg_qty)
-                        else:
-                            order = shared_classes.I_S_MKT_Order(tradingsymbol=tsym, quantity=per_leg_qty)
-                        orders = [copy.deepcopy(order) for _ in range(nlegs)]
-                    if rem_qty:
-                        if action == 'Buy':
-                            order = shared_classes.I_B_MKT_Order(tradingsymbol=tsym, quantity=rem_qty)
-                        else:
-                            order = shared_classes.I_S_MKT_Order(tradingsymbol=tsym, quantity=rem_qty)
-                        orders.append(order)
+            ctor = None
+            if sym in _NSE_EQUITY_SYMS and ltp is not None:
+                if order_prod_type == 'I':
+                    ctor = shared_classes.I_B_MKT_Order if action == 'Buy' else shared_classes.I_S_MKT_Order
+                    leg_kwargs = {}
 
-                elif inst_info.order_prod_type == 'B':  # Bracket Order
+                elif order_prod_type == 'B':  # Bracket Order
                     pp = inst_info.profit_per / 100.0
                     sl_p = inst_info.stoploss_per / 100.0
                     bp = utils.round_stock_prec(ltp * pp, base=ti)
                     bl = utils.round_stock_prec(ltp * sl_p, base=ti)
-                    logger.debug(f'ltp:{ltp} pp:{pp} bp:{bp} sl_p:{sl_p} bl:{bl}')
+                    logger.debug('ltp:%s pp:%s bp:%s sl_p:%s bl:%s', ltp, pp, bp, sl_p, bl)
 
-                    if per_leg_qty:
-                        if action == 'Buy':
-                            order = shared_classes.BO_B_MKT_Order(tradingsymbol=tsym,
-                                                                  quantity=per_leg_qty, book_loss_price=bl,
-                                                                  book_profit_price=bp, bo_remarks=remarks)
-                        else:
-                            order = shared_classes.BO_S_MKT_Order(tradingsymbol=tsym,
-                                                                  quantity=per_leg_qty, book_loss_price=bl,
-                                                                  book_profit_price=bp, bo_remarks=remarks)
-                        orders = [copy.deepcopy(order) for _ in range(nlegs)]
-
-                    if rem_qty:
-                        if action == 'Buy':
-                            order = shared_classes.BO_B_MKT_Order(tradingsymbol=tsym,
-                                                                  quantity=rem_qty, book_loss_price=bl,
-                                                                  book_profit_price=bp, bo_remarks=remarks)
-                        else:
-                            order = shared_classes.BO_S_MKT_Order(tradingsymbol=tsym,
-                                                                  quantity=rem_qty, book_loss_price=bl,
-                                                                  book_profit_price=bp, bo_remarks=remarks)
-                        orders.append(order)
+                    ctor = shared_classes.BO_B_MKT_Order if action == 'Buy' else shared_classes.BO_S_MKT_Order
+                    leg_kwargs = {'book_loss_price': bl, 'book_profit_price': bp}
 
-                elif inst_info.order_prod_type == 'O':  # OCO - Order
+                elif order_prod_type == 'O':  # OCO - Order
                     pp = inst_info.profit_per / 100.0
                     sl_p = inst_info.stoploss_per / 100.0
 
-                    bp1 = utils.round_stock_prec(ltp + pp * ltp, base=ti)
-                    bp2 = utils.round_stock_prec(ltp - pp * ltp, base=ti)
-                    bp = bp1 if action == 'Buy' else bp2
-
-                    bl1 = utils.round_stock_prec(ltp - sl_p * ltp, base=ti)
-                    bl2 = utils.round_stock_prec(ltp + sl_p * ltp, base=ti)
+                    # Profit is booked above ltp for Buy and below it for Sell,
+                    # loss on the other side. Only the pair needed is rounded.
+                    sign = 1.0 if action == 'Buy' else -1.0
+                    bp = utils.round_stock_prec(ltp + sign * pp * ltp, base=ti)
+                    bl = utils.round_stock_prec(ltp - sign * sl_p * ltp, base=ti)
+                    logger.debug('ltp:%s pp:%s bp:%s sl_p:%s bl:%s', ltp, pp, bp, sl_p, bl)
 
-                    bl = bl1 if action == 'Buy' else bl2
-                    logger.debug(f'ltp:{ltp} pp:{pp} bp:{bp} sl_p:{sl_p} bl:{bl}')
-
-                    if per_leg_qty:
-                        if action == 'Buy':
-                            order = shared_classes.Combi_Primary_B_MKT_And_OCO_S_MKT_I_Order_NSE(tradingsymbol=tsym, quantity=per_leg_qty,
-                                                                                                 bl_alert_p=bl, bp_alert_p=bp,
-                                                                                                 remarks=remarks)
-                        else:
-                            order = shared_classes.Combi_Primary_S_MKT_And_OCO_B_MKT_I_Order_NSE(tradingsymbol=tsym, quantity=per_leg_qty,
-                                                                                                 bl_alert_p=bl, bp_alert_p=bp,
-                                                                                                 remarks=remarks)
-                        # deep copy is not required as object contain same info and are not
-                        # modified
-                        orders = [copy.deepcopy(order) for _ in range(nlegs)]
-
-                    if rem_qty:
-                        if action == 'Buy':
-                            order = shared_classes.Combi_Primary_B_MKT_And_OCO_S_MKT_I_Order_NSE(tradingsymbol=tsym, quantity=rem_qty,
-                                                                                                 bl_alert_p=bl, bp_alert_p=bp,
-                                                                                                 remarks=remarks)
-                        else:
-                            order = shared_classes.Combi_Primary_S_MKT_And_OCO_B_MKT_I_Order_NSE(tradingsymbol=tsym, quantity=rem_qty,
-                                                                                                 bl_alert_p=bl, bp_alert_p=bp,
-                                                                                                 remarks=remarks)
-                        orders.append(order)
-                else:
-                    ...
-
-                if not use_gtt_oco:
-                    ...
-                    # bp = utils.round_stock_prec(ltp * pp, base=ti)
-                    # bl = utils.round_stock_prec(ltp * sl_p, base=ti)
-                    # logger.debug(f'ltp:{ltp} pp:{pp} bp:{bp} sl_p:{sl_p} bl:{bl}')
-
-                    # if per_leg_qty:
-                    #     if action == 'Buy':
-                    #         order = shared_classes.BO_B_MKT_Order(tradingsymbol=tsym,
-                    #                                             quantity=per_leg_qty, book_loss_price=bl,
-                    #                                             book_profit_price=bp, bo_remarks=remarks)
-                    #     else:
-                    #         order = shared_classes.BO_S_MKT_Order(tradingsymbol=tsym,
-                    #                                             quantity=per_leg_qty, book_loss_price=bl,
-                    #                                             book_profit_price=bp, bo_remarks=remarks)
-                    #     orders = [copy.deepcopy(order) for _ in range(nlegs)]
-
-                    # if rem_qty:
-                    #     if action == 'Buy':
-                    #         order = shared_classes.BO_B_MKT_Order(tradingsymbol=tsym,
-                    #                                             quantity=rem_qty, book_loss_price=bl,
-                    #                                             book_profit_price=bp, bo_remarks=remarks)
-                    #     else:
-                    #         order = shared_classes.BO_S_MKT_Order(tradingsymbol=tsym,
-                    #                                             quantity=rem_qty, book_loss_price=bl,
-                    #                                             book_profit_price=bp, bo_remarks=remarks)
-                    #     orders.append(order)
+                    if action == 'Buy':
+                        ctor = shared_classes.Combi_Primary_B_MKT_And_OCO_S_MKT_I_Order_NSE
+                    else:
+                        ctor = shared_classes.Combi_Primary_S_MKT_And_OCO_B_MKT_I_Order_NSE
+                    leg_kwargs = {'bl_alert_p': bl, 'bp_alert_p': bp}
                 else:
                     ...
-                    # bp1 = utils.round_stock_prec(ltp + pp * ltp, base=ti)
-                    # bp2 = utils.round_stock_prec(ltp - pp * ltp, base=ti)
-                    # bp = bp1 if action == 'Buy' else bp2
-
-                    # bl1 = utils.round_stock_prec(ltp - sl_p * ltp, base=ti)
-                    # bl2 = utils.round_stock_prec(ltp + sl_p * ltp, base=ti)
-
-                    # bl = bl1 if action == 'Buy' else bl2
-                    # logger.debug(f'ltp:{ltp} pp:{pp} bp:{bp} sl_p:{sl_p} bl:{bl}')
-
-                    # if per_leg_qty:
-                    #     if action == 'Buy':
-                    #         order = shared_classes.Combi_Primary_B_MKT_And_OCO_S_MKT_I_Order_NSE(tradingsymbol=tsym, quantity=per_leg_qty,
-                    #                                                                             bl_alert_p=bl, bp_alert_p=bp,
-                    #                                                                             remarks=remarks)
-                    #     else:
-                    #         order = shared_classes.Combi_Primary_S_MKT_And_OCO_B_MKT_I_Order_NSE(tradingsymbol=tsym, quantity=per_leg_qty,
-                    #                                                                             bl_alert_p=bl, bp_alert_p=bp,
-                    #                                                                             remarks=remarks)
-                    #     # deep copy is not required as object contain same info and are not
-                    #     # modified
-                    #     orders = [copy.deepcopy(order) for _ in range(nlegs)]
-
-                    # if rem_qty:
-                    #     if action == 'Buy':
-                    #         order = shared_classes.Combi_Primary_B_MKT_And_OCO_S_MKT_I_Order_NSE(tradingsymbol=tsym, quantity=rem_qty,
-                    #                                                                             bl_alert_p=bl, bp_alert_p=bp,
-                    #                                                                             remarks=remarks)
-                    #     else:
-                    #         order = shared_classes.Combi_Primary_S_MKT_And_OCO_B_MKT_I_Order_NSE(tradingsymbol=tsym, quantity=rem_qty,
-                    #                                                                             bl_alert_p=bl, bp_alert_p=bp,
-                    #                                                                             remarks=remarks)
-                    #     orders.append(order)
             else:
+                use_gtt_oco = order_prod_type == 'O'
                 if use_gtt_oco:
                     pp = inst_info.profit_points
                     bp = utils.round_stock_prec(ltp + pp, base=ti)
 
                     sl_p = inst_info.stoploss_points
                     bl = utils.round_stock_prec(ltp - sl_p, base=ti)
-                    logger.debug(f'ltp:{ltp} pp:{pp} bp:{bp} sl_p:{sl_p} bl:{bl}')
+                    logger.debug('ltp:%s pp:%s bp:%s sl_p:%s bl:%s', ltp, pp, bp, sl_p, bl)
                 else:
                     bp = bl = None
 
-                if per_leg_qty:
-                    order = shared_classes.Combi_Primary_B_MKT_And_OCO_S_MKT_I_Order_NFO(tradingsymbol=tsym, quantity=per_leg_qty,
-                                                                                         bl_alert_p=bl, bp_alert_p=bp,
-                                                                                         remarks=remarks)
-                    orders = [copy.deepcopy(order) for _ in range(nlegs)]
+                ctor = shared_classes.Combi_Primary_B_MKT_And_OCO_S_MKT_I_Order_NFO
+                leg_kwargs = {'bl_alert_p': bl, 'bp_alert_p': bp}
 
-                if rem_qty:
-                    order = shared_classes.Combi_Primary_B_MKT_And_OCO_S_MKT_I_Order_NFO(tradingsymbol=tsym, quantity=rem_qty,
-                                                                                         bl_alert_p=bl, bp_alert_p=bp,
-                                                                                         remarks=remarks)
-                    orders.append(order)
+            orders = []
+            if ctor is not None:
+                try:
+                    orders = _build_orders(ctor, leg_qtys, qty, tradingsymbol=tsym, **leg_kwargs)
+                except Exception:
+                    logger.error(traceback.format_exc())
+                    raise
 
             if len(orders):
-                for i, order in enumerate(orders):
-                    try:
-                        if isinstance(order, shared_classes.BO_B_MKT_Order) or isinstance(order, shared_classes.BO_S_MKT_Order) \
-                                or isinstance(order, shared_classes.I_B_MKT_Order) or isinstance(order, shared_classes.I_S_MKT_Order):
-                            remarks = f'TeZ_{i+1}_Qty_{order.quantity:.0f}_of_{qty:.0f}'
-                        else:
-                            remarks = f'TeZ_{i+1}_Qty_{order.primary_order_quantity:.0f}_of_{qty:.0f}'
-                        # logger.info(remarks)
-                        order.remarks = remarks
-                        # logger.info(f'order: {i} -> {order}')
-                    except Exception:
-                        logger.error(traceback.format_exc())
-                        raise
-
                 tsym_token = tsym + '_' + str(token)
-                logger.debug(f'Record Symbol: {tsym_token}')
+                logger.debug('Record Symbol: %s', tsym_token)
                 if str(token) == '26000' or str(token) == '26009':
                     logger.error(f'Major issue: token belongs to Index {str(token)}')
                     tsym_token = None
@@ -28,17 +28,22 @@ from app_utils import app_logger
 logger = app_logger.get_logger(__name__)
 
 try:
+    import atexit
     import json
     import locale
+    import logging
     import os
     import re
+    import tempfile
+    from operator import attrgetter
+    from concurrent.futures import ThreadPoolExecutor, wait
     from dataclasses import dataclass
     from datetime import datetime, time
     from enum import Enum
-    from threading import Lock, Thread
+    from threading import Event, Lock, Thread
+    from time import sleep
     from typing import Callable
 
-    import numpy as np
     import pandas as pd
     from rich.console import Console
     from rich.table import Table
@@ -59,6 +64,11 @@ except Exception as e:
 
 locale.setlocale(locale.LC_ALL, '')
 
+_BEES_RE = re.compile(r'NIFTYBEES|BANKBEES')
+_OPT_RE = re.compile(r'([CP])(\d+)')
+_OPEN_ORDER_STATUSES = frozenset({'open', 'pending', 'trigger_pending'})
+_CONSOLE = Console()
+
 class MOVE_TO_COST_STATE(Enum):
     WAITING_UP_CROSS = 0
     WAITING_DOWN_CROSS = 1
@@ -73,11 +83,29 @@ class Portfolio_CreateConfig:
     store_file: str
     mo: str
 
+@dataclass(slots=True)
+class WaitOrder:
+    click_time: str
+    click_price: float
+    tsym_token: str
+    ul_token: str
+    ul_index: str
+    use_gtt_oco: bool
+    trade: str
+    wait_price_lvl: int
+    n_orders: int
+    order_list: list
+    prev_tick_lvl: int = None
+    status: str = 'Waiting'
+
 from dataclasses import dataclass
 
 #g_count = 0
 
 class Portfolio:
+    COLUMNS = ["ul_index", "available_qty", "max_qty"]
+    FLUSH_DELAY = 0.25  # secs to let a burst of fills settle into one write
+
     def __init__(self, pf_cc: Portfolio_CreateConfig):
         self.store_file = pf_cc.store_file
         pf_cc.mo = pf_cc.mo
@@ -101,116 +129,180 @@ class Portfolio:
         cutoff_datetime = cutoff_datetime.replace(second=0)
         cutoff_datetime = cutoff_datetime.replace(microsecond=0)
 
+        # Positions keyed by tsym_token; each row holds the COLUMNS values.
+        # A DataFrame is built from them only to display or store them.
+        self._rows: dict[str, dict] = {}
+        # ul_index -> tsym_tokens of that underlying, in insertion order
+        self._ul_tokens: dict[str, dict[str, None]] = {}
+        # (available_qty, max_qty) totals per ul_index, rebuilt after an update
+        self._ul_sums: dict[str, tuple[int, int]] = None
+
+        # Updates only mark the store dirty; a background thread writes it.
+        self._write_lock = Lock()
+        self._dirty = Event()
+
         # Check if the file is absent or modification time is more than the cutoff time
         if not os.path.exists(file_path) or modification_datetime <= cutoff_datetime:
-            # Create an empty DataFrame with specified columns
-            self.stock_data = pd.DataFrame(columns=["tsym_token", "ul_index", "available_qty", "max_qty"])
-            logger.debug(f"File :{self.store_file} is absent or modification time is more than cutoff time. Empty DataFrame created.")
-            self.stock_data.to_csv(self.store_file, index=False)
+            logger.debug(f"File :{self.store_file} is absent or modification time is more than cutoff time. Empty Portfolio created.")
+            self._write()
         else:
-            # Read the CSV file into a DataFrame
-            self.stock_data = pd.read_csv(file_path)
-            logger.debug(f"File: {file_path} was modified after 9:15 am today. DataFrame created successfully.")
-
-        self.stock_data.set_index("tsym_token", inplace=True)
+            # Read the CSV file into the position rows
+            stock_data = pd.read_csv(file_path)
+            for tsym_token, ul_index, available_qty, max_qty in stock_data[["tsym_token", *Portfolio.COLUMNS]].itertuples(index=False, name=None):
+                self._rows[tsym_token] = {"ul_index": ul_index, "available_qty": int(available_qty), "max_qty": int(max_qty)}
+                self._ul_tokens.setdefault(ul_index, {})[tsym_token] = None
+            logger.debug(f"File: {file_path} was modified after 9:15 am today. Portfolio loaded successfully.")
+
+        Thread(name='Portfolio Store Flusher', target=self._flusher, daemon=True).start()
+        # The flusher is a daemon thread; write any pending rows on every interpreter exit.
+        atexit.register(self.flush)
+
+    def _to_frame(self, rows=None):
+        df = pd.DataFrame.from_dict(self._rows if rows is None else rows, orient='index', columns=Portfolio.COLUMNS)
+        df.index.name = "tsym_token"
+        return df
+
+    def _save(self):
+        self._ul_sums = None
+        self._dirty.set()
+
+    def _write(self):
+        with self._write_lock:
+            rows = {tsym_token: dict(row) for tsym_token, row in list(self._rows.items())}
+            # Write next to the store and swap it in, so that an interrupted
+            # write never leaves a truncated portfolio behind.
+            dir_name = os.path.dirname(os.path.abspath(self.store_file))
+            with tempfile.NamedTemporaryFile('w', dir=dir_name, suffix='.tmp', delete=False, newline='') as f:
+                tmp_file = f.name
+                self._to_frame(rows).reset_index().to_csv(f, index=False)
+            os.replace(tmp_file, self.store_file)
+
+    def _flusher(self):
+        while True:
+            self._dirty.wait()
+            sleep(Portfolio.FLUSH_DELAY)
+            self._dirty.clear()
+            try:
+                self._write()
+            except Exception:
+                logger.error(traceback.format_exc())
+
+    def flush(self):
+        self._dirty.clear()
+        self._write()
+
+    def _ul_rows(self, ul_index):
+        rows = self._rows
+        return [rows[tsym_token] for tsym_token in list(self._ul_tokens.get(ul_index, ()))]
+
+    def _ul_totals(self, ul_index):
+        sums = self._ul_sums
+        if sums is None:
+            sums = {}
+            for row in list(self._rows.values()):
+                avail, max_qty = sums.get(row["ul_index"], (0, 0))
+                sums[row["ul_index"]] = (avail + row["available_qty"], max_qty + row["max_qty"])
+            self._ul_sums = sums
+        return sums.get(ul_index, (0, 0))
 
     def update_position_taken(self, tsym_token, ul_index, qty):
-        if tsym_token not in self.stock_data.index:
-            self.stock_data.loc[tsym_token] = ["", 0, 0]
-        self.stock_data.loc[tsym_token, "ul_index"] = ul_index  # Assign value to "ul_index" column
-        self.stock_data.loc[tsym_token, "available_qty"] += qty
-        if qty > 0:
-            self.stock_data.loc[tsym_token, "max_qty"] = max(self.stock_data.loc[tsym_token, "max_qty"],
-                                                             self.stock_data.loc[tsym_token, "available_qty"])
-        else:
-            self.stock_data.loc[tsym_token, "max_qty"] = min(self.stock_data.loc[tsym_token, "max_qty"],
-                                                             self.stock_data.loc[tsym_token, "available_qty"])
-        logger.debug(f'\n{self.stock_data}')
-        self.stock_data.to_csv(self.store_file, index=True)
+        row = self._rows.get(tsym_token)
+        if row is None:
+            row = self._rows[tsym_token] = {"ul_index": ul_index, "available_qty": 0, "max_qty": 0}
+            self._ul_tokens.setdefault(ul_index, {})[tsym_token] = None
+        elif row["ul_index"] != ul_index:
+            self._ul_tokens.get(row["ul_index"], {}).pop(tsym_token, None)
+            self._ul_tokens.setdefault(ul_index, {})[tsym_token] = None
+        new_avail = row["available_qty"] + qty
+        cur_max = row["max_qty"]
+        new_max = max(cur_max, new_avail) if qty > 0 else min(cur_max, new_avail)
+        row.update(ul_index=ul_index, available_qty=new_avail, max_qty=new_max)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f'\n{self._to_frame()}')
+        self._save()
 
     def update_position_closed(self, tsym_token, qty):
-        if tsym_token in self.stock_data.index:
-            self.stock_data.loc[tsym_token, "available_qty"] -= qty
-            if self.stock_data.loc[tsym_token, "available_qty"] == 0:
-                self.stock_data.loc[tsym_token, "max_qty"] = 0
-            self.stock_data.to_csv(self.store_file, index=True)
+        row = self._rows.get(tsym_token)
+        if row is not None:
+            row["available_qty"] -= qty
+            if row["available_qty"] == 0:
+                row["max_qty"] = 0
+            self._save()
 
-        logger.debug(f'\n{self.stock_data}')
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f'\n{self._to_frame()}')
 
     def max_qty(self, tsym_token=None, ul_index=None):
-        if tsym_token and tsym_token in self.stock_data.index:
-            return self.stock_data.loc[tsym_token, "max_qty"]
+        if not self._rows:
+            return 0
+        if tsym_token and tsym_token in self._rows:
+            return self._rows[tsym_token]["max_qty"]
         if ul_index is not None:
-            ul_data = self.stock_data[self.stock_data['ul_index'] == ul_index]
-            if not ul_data.empty:
-                return ul_data['max_qty'].sum()
+            return self._ul_totals(ul_index)[1]
         return 0
 
     def available_qty(self, tsym_token=None, ul_index=None):
-        if tsym_token and tsym_token in self.stock_data.index:
-            return self.stock_data.loc[tsym_token, "available_qty"]
+        if not self._rows:
+            return 0
+        if tsym_token and tsym_token in self._rows:
+            return self._rows[tsym_token]["available_qty"]
         if ul_index is not None:
-            ul_data = self.stock_data[self.stock_data['ul_index'] == ul_index]
-            if not ul_data.empty:
-                return ul_data['available_qty'].sum()
+            return self._ul_totals(ul_index)[0]
         return 0
 
     def verify_reset(self, ul_index=None):
-        df = self.stock_data
-        if len(df):
+        if len(self._rows):
             if ul_index:
-                not_zero_available_qty = df.loc[(df['ul_index'] == ul_index) & (df['available_qty'] != 0), 'available_qty']
-                if not_zero_available_qty.any():
+                ul_rows = self._ul_rows(ul_index)
+                aq_rows = [row for row in ul_rows if row["available_qty"] != 0]
+                mq_rows = [row for row in ul_rows if row["max_qty"] != 0]
+                if aq_rows:
                     logger.info("available_qty is not already 0 and is being set to 0. Verify on Broker Terminal")
-                    df.loc[(df['ul_index'] == ul_index), 'available_qty'] = 0
-                
                 # Check if max_qty is not already 0, and if so, set it to 0
-                not_zero_max_qty = df.loc[(df['ul_index'] == ul_index) & (df['max_qty'] != 0), 'max_qty']
-                if not_zero_max_qty.any():
+                if mq_rows:
                     logger.info("max_qty is not already 0 and is being set to 0. Verify on Broker Terminal")
-                    df.loc[(df['ul_index'] == ul_index), 'max_qty'] = 0
             else:
             # For all rows, irrespective of ul_index
-                # Check if available_qty is not already 0, and if so, set it to 0
-                not_zero_available_qty = df[df['available_qty'] != 0]
-                if not_zero_available_qty.shape[0] > 0:  # Check if there are non-zero elements
-                    for index, row in not_zero_available_qty.iterrows():
-                        logger.info(f"Available_qty is not already 0 for ul_index {row['ul_index']} and is forced to 0.")
-                        logger.info(f"Please check the broker's terminal")
-                    df.loc[not_zero_available_qty.index, 'available_qty'] = 0
-
-                # Check if max_qty is not already 0, and if so, set it to 0
-                not_zero_max_qty = df[df['max_qty'] != 0]
-                if not_zero_max_qty.shape[0] > 0:  # Check if there are non-zero elements
-                    for index, row in not_zero_max_qty.iterrows():
-                        logger.info(f"max_qty is not already 0 for ul_index {row['ul_index']} and is forced to 0.")
-                        logger.info(f"Please check the broker's terminal")
-                    df.loc[not_zero_max_qty.index, 'max_qty'] = 0
-
-            self.stock_data.to_csv(self.store_file, index=True)
+                aq_rows = [row for row in self._rows.values() if row["available_qty"] != 0]
+                mq_rows = [row for row in self._rows.values() if row["max_qty"] != 0]
+                for row in aq_rows:
+                    logger.info(f"Available_qty is not already 0 for ul_index {row['ul_index']} and is forced to 0.")
+                    logger.info(f"Please check the broker's terminal")
+                for row in mq_rows:
+                    logger.info(f"max_qty is not already 0 for ul_index {row['ul_index']} and is forced to 0.")
+                    logger.info(f"Please check the broker's terminal")
+
+            for row in aq_rows:
+                row["available_qty"] = 0
+            for row in mq_rows:
+                row["max_qty"] = 0
+            # Nothing to persist when every row was already zero
+            if aq_rows or mq_rows:
+                self._save()
 
     def update_portfolio_from_position(self, posn_df):
-        pf_df = self.stock_data
-        for tsym_token, row in pf_df.iterrows():
+        # First position per token, looked up once per portfolio row.
+        netqty_by_token = dict(zip(posn_df['token'].values[::-1], posn_df['netqty'].values[::-1]))
+        for tsym_token, row in self._rows.items():
             _, token = tsym_token.split('_')
             rec_qty = row['available_qty']
-            matching_row = posn_df.loc[posn_df['token'] == token]
-            posn_qty = matching_row['netqty'].iloc[0] if not matching_row.empty else 0
+            posn_qty = netqty_by_token.get(token, 0)
             if posn_qty > 0:
                 net_qty = min(posn_qty, rec_qty)
             else:
                 net_qty = max(posn_qty, rec_qty)
-            pf_df.loc[tsym_token, 'available_qty'] = net_qty
-        self.stock_data.to_csv(self.store_file, index=True)
-        logger.debug(f'\n{pf_df}')
+            row['available_qty'] = net_qty
+        self._save()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f'\n{self._to_frame()}')
 
     def fetch_all_available_qty(self, ul_index):
         logger.info(f'ul_index: {ul_index}')
-        return (self.stock_data[self.stock_data["ul_index"] == ul_index].copy())
+        # A fresh frame of just this underlying's rows; the caller owns it.
+        rows = self._rows
+        return self._to_frame({tsym_token: rows[tsym_token] for tsym_token in list(self._ul_tokens.get(ul_index, ()))})
 
     def show (self):
-        df = self.stock_data
-        console = Console()
         table = Table(title='Portfolio-Records')
         table.add_column("#", justify="center")
 
@@ -218,14 +310,14 @@ class Portfolio:
         table.add_column("tsym_token", justify="center")
 
         # Add header row
-        for column in df.columns:
+        for column in Portfolio.COLUMNS:
             table.add_column(column, justify="center")
 
         # Add data rows
-        for i, (index, row) in enumerate(df.iterrows(), start=1):
-            table.add_row(str(i), index, *[str(value) for value in row.tolist()])
+        for i, (tsym_token, row) in enumerate(list(self._rows.items()), start=1):
+            table.add_row(str(i), tsym_token, *(str(row[column]) for column in Portfolio.COLUMNS))
 
-        console.print(table)
+        _CONSOLE.print(table)
 
 
 @dataclass
@@ -245,6 +337,9 @@ class PFMU:
     __count = 0
     __componentType = Component_Type.ACTIVE
     AUTO_TRAILER_PROC_MAX_COUNT = 15
+    MANUAL_PNL_REFRESH_COUNT = 3
+    ORDER_EXEC_CLOSE_TIMEOUT = 10.0  # secs close() waits on placements already running
+    WO_SHOW_COLUMNS = ["click_time", "click_price", "wait_price_lvl", "tsym_token", "trade", "n_orders", "use_gtt_oco", "status"]
 
     def __init__(self, pfmu_cc: PFMU_CreateConfig):
         logger.info(f'{PFMU.__count}: Creating PFMU Object..')
@@ -252,6 +347,8 @@ class PFMU:
         PFMU.__count += 1
         
         self.auto_trailer_proc_cnt = PFMU.AUTO_TRAILER_PROC_MAX_COUNT
+        self.manual_pnl_cnt = 0
+        self.last_pnl = None
 
         self.pf_lock = Lock()
 
@@ -272,37 +369,27 @@ class PFMU:
 
         self.limit_order_cfg = pfmu_cc.limit_order_cfg
         self.prec_factor = 100
-
-        self.wo_df = None
+        # (exchange, token) -> security info; freeze qty and lot size do not change intraday
+        self._sec_info_cache: dict[tuple[str, str], dict] = {}
+        # tokens traded in this session, for intra_day_pnl
+        self._pnl_orders_df = None
+        self._pnl_tokens: frozenset[str] = frozenset()
+
+        # Waiting orders keyed by key_name, in insertion order.
+        # _wo_keys holds the same keys by position, as shown in the table.
+        self._wo_rows: dict[str, WaitOrder] = None
+        self._wo_keys: list[str] = None
+        self._wo_render_sig = None
         self.ord_lock = None
+        self._order_exec = None
+        self._order_futs = set()
         if pfmu_cc.limit_order_cfg:
             self.ord_lock = Lock()
-            self.wo_df = pd.DataFrame(
-                columns=[
-                    "click_time",
-                    "click_price",
-                    "tsym_token",
-                    "ul_index",
-                    "use_gtt_oco",
-                    "trade",
-                    "wait_price_lvl",
-                    "prev_tick_lvl",
-                    "n_orders",
-                    "order_list",
-                    "status"], 
-                # dtype={
-                #     "click_price": float,
-                #     "tsym_token": str,
-                #     "ul_index": str,
-                #     "use_gtt_oco": bool,
-                #     "cond": int,
-                #     "wait_price_lvl": int,
-                #     "prev_tick_lvl": int,
-                #     "n_orders": int,
-                #     "order_list": object,
-                #     "status": str
-                # }                    
-            )
+            # Triggered waiting orders are placed from a small pool instead of a
+            # thread each; placements serialize on ord_lock anyway.
+            self._order_exec = ThreadPoolExecutor(max_workers=4, thread_name_prefix='PMU Order Placement')
+            self._wo_rows = {}
+            self._wo_keys = []
 
         bku_cc = BookKeeperUnitCreateConfig(pfmu_cc.rec_file, pfmu_cc.reset)
         self.bku = BookKeeperUnit(bku_cc=bku_cc)
@@ -330,26 +417,33 @@ class PFMU:
     def start_monitoring(self):
         self.pmu.start_monitoring()
 
-    def wo_table_show(self):
+    def wo_table_show(self, force=False):
         if self.limit_order_cfg:
-            df = self.wo_df[["click_time","click_price", "wait_price_lvl", "tsym_token", "trade", "n_orders", "use_gtt_oco", "status"]]
-            console = Console()
+            rows = list(self._wo_rows.values())
+            # Skip the redraw when no order was added and no status moved
+            # since the last render, unless the caller asks for it.
+            sig = tuple(row.status for row in rows)
+            if not force and sig == self._wo_render_sig:
+                return
+            self._wo_render_sig = sig
+
             table = Table(title='Waiting-Order-Records')
             table.add_column("#", justify="center")
 
             # Add header row
-            for column in df.columns:
+            for column in PFMU.WO_SHOW_COLUMNS:
                 table.add_column(column, justify="center")
 
             # Add data rows
-            for i, (_, row) in enumerate(df.iterrows(), start=1):
-                table.add_row(str(i), *[str(value) for value in row.tolist()])
+            show_fields = attrgetter(*PFMU.WO_SHOW_COLUMNS)
+            for i, row in enumerate(rows, start=1):
+                table.add_row(str(i), *map(str, show_fields(row)))
 
-            console.print(table)
+            _CONSOLE.print(table)
 
     def show(self):
         self.bku.show()
-        self.wo_table_show()
+        self.wo_table_show(force=True)
         self.portfolio.show()
 
     def _add_order(
@@ -363,40 +457,41 @@ class PFMU:
             order_list: list, action:str):
         # Find the index where it would lie in OrderBank
 
-        index = len(self.wo_df)
+        index = len(self._wo_rows)
         key_name = f"{ul_token}_{index}"
 
-        wait_price_lvl = round(wait_price * self.prec_factor)
+        # Prices are positive, so adding half and truncating rounds to the
+        # nearest level without the cost of round().
+        wait_price_lvl = int(wait_price * self.prec_factor + 0.5)
 
         # Create a new row with initial values
 
         now = datetime.now().strftime("%H:%M:%S")
 
-        new_order = {
-            "click_time" : now,
-            "click_price": click_price,
-            "tsym_token": tsym_token,
-            "ul_index": ul_index,
-            "use_gtt_oco": use_gtt_oco,
-            "trade": action,
-            "wait_price_lvl": int(wait_price_lvl),
-            "prev_tick_lvl": np.nan,
-            "n_orders": len(order_list),
-            "order_list": order_list,
-            "status": 'Waiting'
-        }
+        new_order = WaitOrder(
+            click_time=now,
+            click_price=click_price,
+            tsym_token=tsym_token,
+            ul_token=str(ul_token),
+            ul_index=ul_index,
+            use_gtt_oco=use_gtt_oco,
+            trade=action,
+            wait_price_lvl=wait_price_lvl,
+            n_orders=len(order_list),
+            order_list=order_list)
 
 
         with self.ord_lock:
-            # Append the new row to OrderBank DataFrame
-            self.wo_df.loc[key_name] = new_order
+            # Append the new row to OrderBank
+            self._wo_rows[key_name] = new_order
+            self._wo_keys.append(key_name)
             # Return the key name for easy access
         return key_name
 
     def _price_condition(self, ltp: float, key_name: str):
         ...
     #     r = False
-    #     order_info = self.wo_df.loc[key_name]
+    #     order_info = self._wo_rows[key_name]
     #     ltp_level = round(ltp * self.prec_factor)
     #     wait_price_lvl = order_info.wait_price_lvl
 
@@ -413,47 +508,81 @@ class PFMU:
     #         self._order_placement_th (key_name=key_name)
     #     else:
     #         with self.ord_lock:
-    #             self.wo_df.loc[key_name, "prev_tick_lvl"] = ltp_level
+    #             self._wo_rows[key_name].prev_tick_lvl = ltp_level
 
     #     return r
 
+    def _process_confirmations(self, orders, os_tuple_list, tsym_token, ul_index):
+        # Records the confirmed orders with the book keeper in one write and
+        # adds the filled quantity to the portfolio. Returns the filled quantity.
+        total_qty = 0
+        rows = []
+        # Built in reverse so that, as with a linear scan, the first order wins on a repeated id.
+        al_id_by_oid = {order.order_id: order.al_id for order in reversed(orders) if order.order_id}
+        for stat, ord_stat in os_tuple_list:
+            order_id = ord_stat.order_id
+            qty = ord_stat.fillshares
+            total_qty += qty
+            rows.append((order_id, tsym_token, qty, ord_stat.fill_timestamp, stat.name, al_id_by_oid.get(order_id)))
+        if rows:
+            self.bku.save_orders(rows)
+
+        logger.info(f'Total Qty taken : {total_qty}')
+        if total_qty:
+            with self.pf_lock:
+                logger.debug('Position Taken %s total_qty: %s', tsym_token, total_qty)
+                self.portfolio.update_position_taken(tsym_token=tsym_token, ul_index=ul_index, qty=total_qty)
+        return total_qty
+
     def order_placement(self, key_name: str):
-        logger.debug(f"Callback triggered for ID: {key_name}")
+        logger.debug('Callback triggered for ID: %s', key_name)
+        tiu = self.tiu
         with self.ord_lock:
-            order_info = self.wo_df.loc[key_name]
+            order_info = self._wo_rows[key_name]
             orders = order_info.order_list
-            resp_exception, resp_ok, os_tuple_list = self.tiu.place_and_confirm_tez_order(orders=orders, use_gtt_oco=order_info.use_gtt_oco)
+            resp_exception, resp_ok, os_tuple_list = tiu.place_and_confirm_tez_order(orders=orders, use_gtt_oco=order_info.use_gtt_oco)
             if resp_exception:
                 logger.info('Exception had occured while placing order: ')
             if resp_ok:
-                logger.debug(f'respok: {resp_ok}')
-
-            total_qty = 0
-            for stat, os in os_tuple_list:
-                status = stat.name
-                order_time = os.fill_timestamp
-                order_id = os.order_id
-                qty = os.fillshares
-                total_qty += qty
-                oco_order = None
-                for order in orders:
-                    if order_id == order.order_id:
-                        oco_order = order.al_id
-                        break
-                self.bku.save_order(order_id, order_info.tsym_token, qty, order_time, status, oco_order)
-
-            logger.debug(f'Total Qty taken : {total_qty}')
-            if total_qty:
-                with self.pf_lock:
-                    self.portfolio.update_position_taken(tsym_token=order_info.tsym_token, ul_index=order_info.ul_index, qty=total_qty)
-            self.show()
+                logger.debug('respok: %s', resp_ok)
 
-            self.wo_table_show()
+            self._process_confirmations(orders, os_tuple_list, tsym_token=order_info.tsym_token, ul_index=order_info.ul_index)
+
+        # Render outside ord_lock so that other placements and cancels are
+        # not held up by console output. show() includes the waiting-order table.
+        self.show()
 
     def _order_placement_th(self, key_name: str, ft:str):
-        logger.debug (f'Creating Thread: key_name:{key_name}')
-        self.wo_df.loc[key_name, "status"] = f"Trig @ {ft}"
-        Thread(name=f'PMU Order Placement Thread {key_name}', target=self.order_placement, args=(key_name,), daemon=True).start()
+        logger.debug ('Queueing order placement: key_name:%s', key_name)
+        self._wo_rows[key_name].status = f"Trig @ {ft}"
+        fut = self._order_exec.submit(self.order_placement, key_name)
+        self._order_futs.add(fut)
+        fut.add_done_callback(self._order_placement_done)
+
+    def _order_placement_done(self, fut):
+        self._order_futs.discard(fut)
+        if fut.cancelled():
+            return
+        # The pool keeps exceptions in the future; log them as a thread would have.
+        exc = fut.exception()
+        if exc is not None:
+            logger.error(''.join(traceback.format_exception(exc)))
+
+    def close(self):
+        # Write what is already recorded before waiting on any broker call.
+        self.portfolio.flush()
+        if self._order_exec is not None:
+            futs = list(self._order_futs)
+            # Placements not yet started are dropped; running ones get a bounded
+            # time to finish and be recorded.
+            self._order_exec.shutdown(wait=False, cancel_futures=True)
+            _, not_done = wait(futs, timeout=PFMU.ORDER_EXEC_CLOSE_TIMEOUT)
+            n_cancelled = sum(1 for fut in futs if fut.cancelled())
+            if n_cancelled:
+                logger.info(f'{n_cancelled} triggered order placement(s) dropped at close: Check Manually')
+            if not_done:
+                logger.error(f'{len(not_done)} order placement(s) still running at close: Check Manually')
+            self.portfolio.flush()
     #
     # def disable_waiting_order(self, id, ul_token=None):
     # def enable_waiting_order(self, id, ul_token=None):
@@ -467,39 +596,35 @@ class PFMU:
             if ul_token:
                 if id:
                     key_name = f"{ul_token}_{id}"
-                    if key_name in self.wo_df.index:
-                        status = self.wo_df.loc[key_name, "status"]
-                        if status == 'Waiting':
+                    row = self._wo_rows.get(key_name)
+                    if row is not None:
+                        if row.status == 'Waiting':
                             self.pmu.unregister_callback(ul_token, callback_id=key_name)
-                            self.wo_df.loc[key_name, "status"] = "Cancelled"
+                            row.status = "Cancelled"
                 else:
                     # search all orders under underlying token, and cancel
-                    if len(self.wo_df):
+                    if len(self._wo_rows):
                         self.__cancel_all_waiting_orders_com__(ul_token=ul_token)
             else:
-                if id < len(self.wo_df):  # Check if id is within the DataFrame's range
-                    status = self.wo_df.iloc[id, self.wo_df.columns.get_loc("status")]
-                    if status == 'Waiting':
-                        key_name = self.wo_df.index[id]
-                        ul_token = key_name.split('_')[0]
+                if id < len(self._wo_keys):  # Check if id is within the records' range
+                    key_name = self._wo_keys[id]
+                    row = self._wo_rows[key_name]
+                    if row.status == 'Waiting':
+                        ul_token = row.ul_token
                         logger.info(f'unregistering: {key_name} ul_token: {ul_token}')
                         # Unregister callback and update status
                         self.pmu.unregister_callback(ul_token, callback_id=key_name)
-                        self.wo_df.iloc[id, self.wo_df.columns.get_loc("status")] = "Cancelled"
+                        row.status = "Cancelled"
 
     def __cancel_all_waiting_orders_com__(self, ul_token):
-        for index, row in self.wo_df.iterrows():
-            key_name = index
-            ul_token_from_key_name = index.split('_')[0]
-
-            if ul_token:
-                if ul_token != ul_token_from_key_name:
-                    continue
-
-            status = row["status"]
-            if status == 'Waiting':
-                self.pmu.unregister_callback(ul_token, callback_id=key_name)
-                self.wo_df.at[key_name, "status"] = "Cancelled"  # Use at[] for setting single values
+        ul_token = str(ul_token) if ul_token else None
+        rows = [(key_name, row) for key_name, row in self._wo_rows.items()
+                if row.status == 'Waiting' and (ul_token is None or row.ul_token == ul_token)]
+        if not rows:
+            return
+        self.pmu.unregister_callbacks_batch([(row.ul_token, key_name) for key_name, row in rows])
+        for _, row in rows:
+            row.status = "Cancelled"
 
     def cancel_all_waiting_orders(self, ul_token=None, exit_flag=False, show_table=True):
         if self.limit_order_cfg:
@@ -523,26 +648,9 @@ class PFMU:
                 if resp_exception:
                     logger.info('Exception had occured while placing order: ')
                 if resp_ok:
-                    logger.debug(f'respok: {resp_ok}')
-
-                for stat, os in os_tuple_list:
-                    status = stat.name
-                    order_time = os.fill_timestamp
-                    order_id = os.order_id
-                    qty = os.fillshares
-                    total_qty += qty
-                    oco_order = None
-                    for order in r.orders_list:
-                        if order_id == order.order_id:
-                            oco_order = order.al_id
-                            break
-                    self.bku.save_order(order_id, r.tsym_token, qty, order_time, status, oco_order)
-                logger.info(f'Total Qty taken : {total_qty}')
-                if total_qty:
-                    with self.pf_lock:
-                        # if (inst_info.symbol == 'NIFTYBEES' or inst_info.symbol == 'BANKBEES') and action == 'Sell':
-                        logger.debug(f'Position Taken {inst_info} total_qty: {total_qty}')
-                        self.portfolio.update_position_taken(tsym_token=r.tsym_token, ul_index=inst_info.ul_index, qty=total_qty)
+                    logger.debug('respok: %s', resp_ok)
+
+                total_qty = self._process_confirmations(r.orders_list, os_tuple_list, tsym_token=r.tsym_token, ul_index=inst_info.ul_index)
                 self.show()
             else:
                 ul_token = self.diu.ul_token
@@ -552,7 +660,7 @@ class PFMU:
                                            click_price=r.ul_ltp, 
                                            wait_price=trade_price, order_list=r.orders_list, action=action)
                
-                order_info = self.wo_df.loc[key_name]
+                order_info = self._wo_rows[key_name]
                 cond_obj = WaitConditionData(condition_fn=self._price_condition, 
                                              callback_function=self._order_placement_th,
                                              cb_id=key_name,
@@ -566,16 +674,33 @@ class PFMU:
 
                 # if g_count == 5:
                 #     # self.pmu.simulate(ultoken=ul_token, trade_price=trade_price, cross='down')
-                logger.debug(f'Registered Call back with PMU {key_name} {cond_obj}')
+                logger.debug('Registered Call back with PMU %s %s', key_name, cond_obj)
 
             return total_qty
 
+    def _security_info(self, exch: str, token: str):
+        r = self._sec_info_cache.get((exch, token))
+        if r is None:
+            r = self.tiu.get_security_info(exchange=exch, token=token)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f'{json.dumps(r, indent=2)}')
+            if isinstance(r, dict):
+                self._sec_info_cache[(exch, token)] = r
+        return r
+
+    @staticmethod
+    def _intraday_positions(posns: list):
+        # Only the columns used for reconciliation, built column-wise
+        cols = {k: [d.get(k) for d in posns] for k in ('prd', 'token', 'netqty')}
+        posn_df = pd.DataFrame(cols)
+        posn_df = posn_df[posn_df['prd'] == 'I'].copy()
+        posn_df['netqty'] = pd.to_numeric(posn_df['netqty'])
+        return posn_df
+
     def _update_portfolio_based_platform(self):
         r = self.tiu.get_positions()
         if r is not None and isinstance(r, list):
-            posn_df = pd.DataFrame(r)
-            posn_df.loc[posn_df['prd'] == 'I', 'netqty'] = posn_df.loc[posn_df['prd'] == 'I', 'netqty'].apply(lambda x: int(x))
-            posn_df = posn_df.loc[(posn_df['prd'] == 'I')]
+            posn_df = PFMU._intraday_positions(r)
             if not posn_df.empty:
                 self.portfolio.update_portfolio_from_position(posn_df=posn_df)
         else:
@@ -588,21 +713,26 @@ class PFMU:
             failure_cnt = 0
             order = None
             closed_qty = 0
-            while (exit_qty and failure_cnt <= Tiu.SQ_OFF_FAILURE_COUNT):
-                per_leg_exit_qty = frz_qty if exit_qty > frz_qty else exit_qty
-                per_leg_exit_qty = int(per_leg_exit_qty / ls) * ls
-
-                if not per_leg_exit_qty:
-                    break
 
-                if order and order.quantity == per_leg_exit_qty:
-                    ...
-                else:
+            # Legs of the largest lot multiple within the freeze qty, then the
+            # lot-multiple remainder; anything below a lot is left over.
+            leg_qty = frz_qty // ls * ls
+            leg_plan = []
+            if leg_qty:
+                n_full, rem_qty = divmod(exit_qty, leg_qty)
+                leg_plan = [leg_qty] * n_full
+                if rem_qty >= ls:
+                    leg_plan.append(rem_qty // ls * ls)
+            legs = iter(leg_plan)
+
+            per_leg_exit_qty = next(legs, 0)
+            while (per_leg_exit_qty and failure_cnt <= Tiu.SQ_OFF_FAILURE_COUNT):
+                if order is None or order.quantity != per_leg_exit_qty:
                     if b_or_s == 'S':
                         order = I_S_MKT_Order(tradingsymbol=tsym, quantity=per_leg_exit_qty, exchange=exchange)
                     if b_or_s == 'B':
                         order = I_B_MKT_Order(tradingsymbol=tsym, quantity=per_leg_exit_qty, exchange=exchange)
-                logger.debug (f'order:{str(order)}')
+                logger.debug ('order:%s', order)
 
                 try:
                     r = self.tiu.get_order_margin(buy_or_sell=b_or_s, exchange=exchange,
@@ -612,7 +742,8 @@ class PFMU:
                     logger.error (f'Exception occured {repr(e)}')
                     return None
                 else:
-                    logger.debug (f"qty: {per_leg_exit_qty} {json.dumps(r, indent=2)}")
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug (f"qty: {per_leg_exit_qty} {json.dumps(r, indent=2)}")
                     if r and r['stat'] == 'Ok':
                         if (r['remarks'] == 'Squareoff Order'):
                             logger.debug (f'square_off_qty: {per_leg_exit_qty}')
@@ -642,6 +773,7 @@ class PFMU:
                     else:
                         logger.debug(f'Exit order InComplete: order_id: {order_id} Check Manually')
                     exit_qty -= per_leg_exit_qty
+                    per_leg_exit_qty = next(legs, 0)
 
             if failure_cnt > 2 or exit_qty:
                 logger.debug(f'Exit order InComplete: Check Manually')
@@ -656,19 +788,20 @@ class PFMU:
             with self.pf_lock:
                 self._update_portfolio_based_platform()
                 df = self.portfolio.fetch_all_available_qty(ul_index=ul_index)
-                logger.debug(f'\n {df}')
+                logger.debug('\n %s', df)
                 if df.empty:
                     logger.debug(f'all available qty is 0')
                     return
                 else:
+                    is_bees = df.index.str.contains(_BEES_RE)
                     if inst_type == 'CE' or inst_type == 'PE':
                         logger.debug(f'inst_type : {inst_type}')
-                        ul_rows = df[~df.index.str.contains('NIFTYBEES|BANKBEES')]
+                        ul_rows = df[~is_bees]
                     if inst_type == 'BEES':
                         logger.debug(f'inst_type : {inst_type}')
-                        ul_rows = df[df.index.str.contains('NIFTYBEES|BANKBEES')]
+                        ul_rows = df[is_bees]
 
-                    logger.debug(f'\n{ul_rows}')
+                    logger.debug('\n%s', ul_rows)
                 # if available quantity of ul_index, CE/PE is not there, then also it should return
                 if ul_rows.empty:
                     return
@@ -676,30 +809,15 @@ class PFMU:
                     total_reduce_qty = 0
                     new_available_qty = None
                     if inst_type == 'CE' or inst_type == 'PE':
-                        pattern = r'([CP])(\d+)'
-                        # Function to extract option type ('C' or 'P') and strike price
-
-                        def extract_option_info(index):
-                            tsym = str(index).split('_')[0]  # Convert index to string before splitting
-                            match = re.search(pattern, tsym)
-                            if match:
-                                option_type = match.group(1)  # Extract 'C' or 'P' from the first group
-                                strike_price = int(match.group(2))  # Extract digits from the second group
-                                return option_type, strike_price
-                            else:
-                                return None, None
-
-                        # Apply the function to each row to extract option type and strike price
-                        ul_rows[['option_type', 'strike_price']] = ul_rows.index.to_series().apply(extract_option_info).apply(pd.Series)
+                        # Option type ('C' or 'P') and strike price from the tsym part of the index
+                        opt_info = ul_rows.index.to_series().str.split('_', n=1).str[0].str.extract(_OPT_RE)
+                        ul_rows = ul_rows.assign(option_type=opt_info[0], strike_price=pd.to_numeric(opt_info[1]))
 
                         if inst_type == 'CE':
-                            # Separate CE and PE strike prices into different DataFrames
-                            ce_df = ul_rows[ul_rows['option_type'] == 'C'].copy()
-                            # Calculate the absolute difference between each strike price and ul_ltp
-                            ce_df['distance_from_ul_ltp'] = ce_df['strike_price'] - ul_ltp
-                            # Sort CE DataFrame based on the distance from ul_ltp in ascending order
-                            ce_df_sorted = ce_df.sort_values(by='distance_from_ul_ltp', ascending=True)
-                            logger.debug(f'{ce_df_sorted}')
+                            # Distance from ul_ltp (strike - ul_ltp) orders the same as the strike itself,
+                            # so CE rows are sorted on strike_price in ascending order
+                            ce_df_sorted = ul_rows[ul_rows['option_type'] == 'C'].sort_values(by='strike_price', ascending=True)
+                            logger.debug('%s', ce_df_sorted)
 
                             if not ce_df_sorted.empty:
                                 max_qty = ce_df_sorted['max_qty'].sum()
@@ -708,12 +826,9 @@ class PFMU:
                                 logger.debug(f'CE: new_available_qty {new_available_qty} total_reduce_qty_ce: {total_reduce_qty}')
                             sq_df = ce_df_sorted
                         else:
-                            pe_df = ul_rows[ul_rows['option_type'] == 'P'].copy()
-                            # Calculate the absolute difference between each strike price and ul_ltp
-                            pe_df['distance_from_ul_ltp'] = pe_df['strike_price'] - ul_ltp
-                            # Sort PE DataFrame based on the distance from ul_ltp in ascending order
-                            pe_df_sorted = pe_df.sort_values(by='distance_from_ul_ltp', ascending=False)
-                            logger.debug(f'{pe_df_sorted}')
+                            # PE rows in descending order of distance from ul_ltp, i.e. of strike_price
+                            pe_df_sorted = ul_rows[ul_rows['option_type'] == 'P'].sort_values(by='strike_price', ascending=False)
+                            logger.debug('%s', pe_df_sorted)
                             if not pe_df_sorted.empty:
                                 max_qty = pe_df_sorted['max_qty'].sum()
                                 total_reduce_qty = int(max_qty * (reduce_per / 100))
@@ -742,11 +857,10 @@ class PFMU:
                         if not act_sq_off_qty:
                             return
 
-                        for index, row in sq_df.iterrows():
+                        for index, available_qty in sq_df['available_qty'].items():
                             tsym_token = str(index)
-                            tsym = tsym_token.split('_')[0] 
-                            token = tsym_token.split('_')[1]
-                            if abs(row["available_qty"]) > 0:
+                            tsym, token = tsym_token.split('_')[:2]
+                            if abs(available_qty) > 0:
                                 if max_qty > 0:
                                     b_or_s = 'S'
                                 else:
@@ -754,8 +868,7 @@ class PFMU:
 
                                 logger.debug(f'Reducing tsym_token: {tsym_token} {tsym} {token} reduce_qty: {act_sq_off_qty} of {diff_qty}')
                                 exch = 'NSE' if '-EQ' in tsym else 'NFO'
-                                r = self.tiu.get_security_info(exchange=exch, token=token)
-                                logger.debug(f'{json.dumps(r, indent=2)}')
+                                r = self._security_info(exch, token)
                                 frz_qty = None
                                 if isinstance(r, dict) and 'frzqty' in r:
                                     frz_qty = int(r['frzqty'])
@@ -808,7 +921,7 @@ class PFMU:
                 else:
                     ...
             try:
-                order_id_list = df_filtered['Order_ID'].tolist()
+                order_id_set = frozenset(df_filtered['Order_ID'].dropna().tolist())
             except TypeError:
                 logger.info('No order to square off')
                 return
@@ -817,34 +930,37 @@ class PFMU:
             if r is not None and isinstance(r, list):
                 order_book_df = pd.DataFrame(r)
                 try:
-                    filtered_df = order_book_df[order_book_df['norenordno'].isin(order_id_list)]
-                    logger.debug(f'\n{filtered_df.to_string()}')
+                    # Open/pending state of every order in the book, shared by both passes below
+                    is_open = order_book_df['status'].str.lower().isin(_OPEN_ORDER_STATUSES)
+                    is_parent = order_book_df['norenordno'].isin(order_id_set)
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug(f'\n{order_book_df[is_parent].to_string()}')
                 except Exception as e:
                     logger.debug(f'Exception : {e}')
                 else:
-                    for index, row in filtered_df.iterrows():
-                        status = row['status'].lower()
-                        if status == 'open' or status == 'pending' or status == 'trigger_pending':
-                            self.tiu.cancel_order(row['norenordno'])
+                    for norenordno in order_book_df.loc[is_parent & is_open, 'norenordno'].tolist():
+                        self.tiu.cancel_order(norenordno)
 
                 # order_book_df remains intact even after filtered df, so can be reused.
                 try:
-                    filtered_df = order_book_df[order_book_df['snonum'].isin(order_id_list)]
-                    logger.debug(f'\n{filtered_df.to_string()}')
+                    is_child = order_book_df['snonum'].isin(order_id_set)
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug(f'\n{order_book_df[is_child].to_string()}')
+                    open_eq_children = order_book_df[is_child & is_open & order_book_df['tsym'].str.contains('-EQ', regex=False, na=False)]
                 except Exception as e:
                     logger.debug(f'Exception : {e}')
                 else:
-                    for index, row in filtered_df.iterrows():
-                        if '-EQ' in row['tsym']:
-                            status = row['status'].lower()
-                            if (status == 'open' or status == 'pending' or status == 'trigger_pending') and int(row['snoordt']) == 0:
-                                r = self.tiu.exit_order(row['snonum'], 'B')
-                                if r is None:
-                                    logger.error("Exit order result is None. Check Manually")
-                                if 'stat' in r and r['stat'] == 'Ok':
-                                    logger.debug(f'child order of {row["norenordno"]} : {row["snonum"]}, status: {json.dumps (r, indent=2)}')
-                                else:
-                                    logger.error('Exit order Failed, Check Manually')
+                    # Bracket-order fields are read only for the rows that need them
+                    for row in open_eq_children.itertuples(index=False):
+                        if int(row.snoordt) == 0:
+                            r = self.tiu.exit_order(row.snonum, 'B')
+                            if r is None:
+                                logger.error("Exit order result is None. Check Manually")
+                            if 'stat' in r and r['stat'] == 'Ok':
+                                if logger.isEnabledFor(logging.DEBUG):
+                                    logger.debug(f'child order of {row.norenordno} : {row.snonum}, status: {json.dumps (r, indent=2)}')
+                            else:
+                                logger.error('Exit order Failed, Check Manually')
             else:
                 logger.info('get_order_book Failed, Check Manually')
                 return
@@ -852,7 +968,7 @@ class PFMU:
             r = self.tiu.get_pending_gtt_order()
             if r is not None and isinstance(r, list):
                 gtt_p_df = pd.DataFrame(r)
-                logger.debug(f'\n{gtt_p_df}')
+                logger.debug('\n%s', gtt_p_df)
                 try:
                     alert_id_list = df_filtered['OCO_Alert_ID'].tolist()
                 except Exception as e:
@@ -861,9 +977,9 @@ class PFMU:
                     # Check oco order pending ..
                     # if there are orders still open ..cancel the orders
                     if gtt_p_df is not None and len(gtt_p_df):
-
+                        pending_al_ids = set(gtt_p_df['al_id'].tolist())
                         for alert_id in alert_id_list:
-                            if not pd.isna(alert_id) and alert_id in gtt_p_df['al_id'].values:
+                            if not pd.isna(alert_id) and alert_id in pending_al_ids:
                                 logger.debug(f'cancelling al_id : {alert_id}')
                                 r = self.tiu.cancel_gtt_order(al_id=str(alert_id))
                                 if r is not None and isinstance(r, dict):
@@ -879,31 +995,95 @@ class PFMU:
             # e.g, filter the orders that have remarks 'TEZ' parent order-id which is in the order_id_list, cancel those.
 
             try:
-                sum_qty_by_symbol = df_filtered.groupby('TradingSymbol_Token')['Qty'].sum().reset_index()
+                # A handful of rows; a dict sum is cheaper than a groupby here
+                sum_qty_by_symbol = {}
+                for symbol, qty in zip(df_filtered['TradingSymbol_Token'].tolist(), df_filtered['Qty'].tolist()):
+                    sum_qty_by_symbol[symbol] = sum_qty_by_symbol.get(symbol, 0) + qty
             except Exception as e:
                 logger.info(f'Not able to sum qty by symbol: {e}')
                 return
 
             r = self.tiu.get_positions()
             if r is not None and isinstance(r, list):
-                posn_df = pd.DataFrame(r)
-                posn_df.loc[posn_df['prd'] == 'I', 'netqty'] = posn_df.loc[posn_df['prd'] == 'I', 'netqty'].apply(lambda x: int(x))
-                posn_df = posn_df.loc[(posn_df['prd'] == 'I')]
-
-                for index, row in sum_qty_by_symbol.iterrows():
-                    tsym_token = symbol = row['TradingSymbol_Token']
-                    token = symbol.split('_')[1]
-                    tsym = symbol.split('_')[0]
-                    rec_qty = row['Qty']
-                    if not posn_df.empty:
-                        try:
-                            posn_qty = posn_df.loc[posn_df['token'] == str(token), 'netqty'].values[0]
-                        except IndexError:
-                            posn_qty = 0
-                        else:
-                            ...
+                posn_df = PFMU._intraday_positions(r)
+                # first row wins for a repeated token, as with the earlier .values[0]
+                netqty_by_token = dict(zip(posn_df['token'].values[::-1], posn_df['netqty'].values[::-1])) if not posn_df.empty else {}
+
+                def exit_symbol(tsym, token, exch, rec_qty, exit_qty):
+                    # Very Important:  Following should use frz_qty for breaking order into slices
+                    r = self._security_info(exch, token)
+
+                    frz_qty = None
+                    if isinstance(r, dict) and 'frzqty' in r:
+                        frz_qty = int(r['frzqty'])
+                    else:
+                        frz_qty = exit_qty + 1
+
+                    if isinstance(r, dict) and 'ls' in r:
+                        ls = int(r['ls'])  # lot size
                     else:
-                        posn_qty = 0
+                        ls = 1
+
+                    failure_cnt = 0
+                    order_id = None
+                    order = None
+                    closed_qty = 0
+                    # The status of a placed leg is fetched in the background while the
+                    # next leg goes out; the results are collected once all legs are placed.
+                    leg_hists = []
+                    with ThreadPoolExecutor(max_workers=2, thread_name_prefix='Square Off History') as hist_ex:
+                        while (exit_qty and failure_cnt <= Tiu.SQ_OFF_FAILURE_COUNT):
+                            per_leg_exit_qty = frz_qty if exit_qty > frz_qty else exit_qty
+                            per_leg_exit_qty = int(per_leg_exit_qty / ls) * ls
+
+                            if order and order.quantity == per_leg_exit_qty:
+                                ...
+                            else:
+                                if rec_qty > 0:
+                                    order = I_S_MKT_Order(tradingsymbol=tsym, quantity=per_leg_exit_qty, exchange=exch)
+                                else:
+                                    order = I_B_MKT_Order(tradingsymbol=tsym, quantity=per_leg_exit_qty, exchange=exch)
+
+                            # r = self.fv.place_order(buy_or_sell, product_type='I', exchange=exch, tradingsymbol=tsym,
+                            #                         quantity=per_leg_exit_qty, price_type='MKT', discloseqty=0.0)
+
+                            r = self.tiu.place_order(order)
+
+                            if r is None or r['stat'] == 'Not_Ok':
+                                logger.info(f'Exit order Failed:  {r["emsg"] if r else "no response"}')
+                                failure_cnt += 1
+                            else:
+                                logger.info(f'Exit Order Attempt success:: order id  : {r["norenordno"]}')
+                                order_id = r["norenordno"]
+                                leg_hists.append((order_id, per_leg_exit_qty, hist_ex.submit(self.tiu.single_order_history, order_id)))
+                                exit_qty -= per_leg_exit_qty
+
+                        for leg_order_id, leg_qty, hist_fut in leg_hists:
+                            # A failed status fetch only costs its own leg; the quantity
+                            # closed by the other legs is still recorded.
+                            try:
+                                r_os_list = hist_fut.result()
+                                # Shoonya gives a list for all status of order, we are interested in first one
+                                r_os_dict = r_os_list[0]
+                            except Exception as e:
+                                logger.info(f'Exit order status unavailable: order_id: {leg_order_id} {str(e)} Check Manually')
+                                continue
+                            if r_os_dict["status"].lower() == "complete":
+                                closed_qty += leg_qty
+                                logger.info(f'Exit order Complete: order_id: {leg_order_id}')
+                            else:
+                                logger.info(f'Exit order InComplete: order_id: {leg_order_id} Check Manually')
+
+                    if failure_cnt > 2 or exit_qty:
+                        logger.info(f'Exit order InComplete: order_id: {order_id} Check Manually')
+                        raise OrderExecutionException
+                    return closed_qty
+
+                exits = []
+                for symbol, rec_qty in sorted(sum_qty_by_symbol.items()):
+                    tsym_token = symbol
+                    tsym, token = symbol.split('_')[:2]
+                    posn_qty = netqty_by_token.get(token, 0)
                     net_qty = abs(posn_qty)
 
                     # It is possible that manually, user could do following:
@@ -932,66 +1112,49 @@ class PFMU:
                         exit_qty = min(abs(rec_qty), net_qty)
                         logger.debug(f'exit qty:{exit_qty}')
                         exch = 'NSE' if '-EQ' in tsym else 'NFO'
-                        # Very Important:  Following should use frz_qty for breaking order into slices
-                        r = self.tiu.get_security_info(exchange=exch, token=token)
-                        logger.debug(f'{json.dumps(r, indent=2)}')
-
-                        frz_qty = None
-                        if isinstance(r, dict) and 'frzqty' in r:
-                            frz_qty = int(r['frzqty'])
-                        else:
-                            frz_qty = exit_qty + 1
-
-                        if isinstance(r, dict) and 'ls' in r:
-                            ls = int(r['ls'])  # lot size
-                        else:
-                            ls = 1
-
-                        failure_cnt = 0
-                        order = None
-                        closed_qty = 0
-                        while (exit_qty and failure_cnt <= Tiu.SQ_OFF_FAILURE_COUNT):
-                            per_leg_exit_qty = frz_qty if exit_qty > frz_qty else exit_qty
-                            per_leg_exit_qty = int(per_leg_exit_qty / ls) * ls
-
-                            if order and order.quantity == per_leg_exit_qty:
-                                ...
-                            else:
-                                if rec_qty > 0:
-                                    order = I_S_MKT_Order(tradingsymbol=tsym, quantity=per_leg_exit_qty, exchange=exch)
-                                else:
-                                    order = I_B_MKT_Order(tradingsymbol=tsym, quantity=per_leg_exit_qty, exchange=exch)
-
-                            # r = self.fv.place_order(buy_or_sell, product_type='I', exchange=exch, tradingsymbol=tsym,
-                            #                         quantity=per_leg_exit_qty, price_type='MKT', discloseqty=0.0)
-
-                            r = self.tiu.place_order(order)
-
-                            if r is None or r['stat'] == 'Not_Ok':
-                                logger.info(f'Exit order Failed:  {r["emsg"]}')
-                                failure_cnt += 1
-                            else:
-                                logger.info(f'Exit Order Attempt success:: order id  : {r["norenordno"]}')
-                                order_id = r["norenordno"]
-                                r_os_list = self.tiu.single_order_history(order_id)
-                                # Shoonya gives a list for all status of order, we are interested in first one
-                                r_os_dict = r_os_list[0]
-                                if r_os_dict["status"].lower() == "complete":
-                                    closed_qty += order.quantity
-                                    logger.info(f'Exit order Complete: order_id: {order_id}')
-                                else:
-                                    logger.info(f'Exit order InComplete: order_id: {order_id} Check Manually')
-                                exit_qty -= per_leg_exit_qty
-
-                        if failure_cnt > 2 or exit_qty:
-                            logger.info(f'Exit order InComplete: order_id: {order_id} Check Manually')
-                            raise OrderExecutionException
-                        elif closed_qty:
+                        exits.append((tsym_token, tsym, token, exch, rec_qty, exit_qty))
+
+                if exits:
+                    # Each symbol is exited independently; the broker calls overlap while
+                    # the portfolio is updated here, one symbol at a time.
+                    # As with a sequential exit, the first failure stops any symbol not yet
+                    # started; exits already in flight run to completion and are recorded.
+                    exit_failed = Event()
+
+                    def run_exit(tsym, token, exch, rec_qty, exit_qty):
+                        if exit_failed.is_set():
+                            return None
+                        try:
+                            return exit_symbol(tsym, token, exch, rec_qty, exit_qty)
+                        except Exception:
+                            exit_failed.set()
+                            raise
+
+                    with ThreadPoolExecutor(max_workers=min(8, len(exits)), thread_name_prefix='Square Off') as ex:
+                        futs = [(tsym_token, rec_qty, ex.submit(run_exit, tsym, token, exch, rec_qty, exit_qty))
+                                for tsym_token, tsym, token, exch, rec_qty, exit_qty in exits]
+                    exit_exc = None
+                    for tsym_token, rec_qty, fut in futs:
+                        try:
+                            closed_qty = fut.result()
+                        except Exception as e:
+                            exit_exc = exit_exc or e
+                            continue
+                        if closed_qty is None:
+                            logger.info(f'tsym_token:{tsym_token} not squared off: an earlier exit failed')
+                            continue
+                        if closed_qty:
                             logger.info(f'tsym_token:{tsym_token} qty: {closed_qty} squared off..')
-                            if rec_qty < 0:
-                                self.portfolio.update_position_closed(tsym_token=tsym_token, qty=-closed_qty)
-                            else:
-                                self.portfolio.update_position_closed(tsym_token=tsym_token, qty=closed_qty)
+                            with self.pf_lock:
+                                if rec_qty < 0:
+                                    self.portfolio.update_position_closed(tsym_token=tsym_token, qty=-closed_qty)
+                                else:
+                                    self.portfolio.update_position_closed(tsym_token=tsym_token, qty=closed_qty)
+                    if exit_exc is not None:
+                        logger.error('Square off stopped after an exit failure; exits already started were recorded')
+                        if isinstance(exit_exc, OrderExecutionException):
+                            raise exit_exc
+                        raise OrderExecutionException from exit_exc
 
         df = self.bku.fetch_order_id()
 
@@ -1030,16 +1193,23 @@ class PFMU:
 
         logger.info("Square off Position - Complete.")
 
+    def _traded_tokens(self, df):
+        # The record frame is replaced on every save, so the token set is only
+        # rebuilt after a new fill has been recorded.
+        if df is not self._pnl_orders_df:
+            # Some times partial orders are filled. In such cases also, it should be tracked. 
+            df_filtered = df[(df['Qty'] != 0) & ((df['Status'] == 'SUCCESS')| (df['Status'] == 'SOFT_FAILURE_QTY'))]
+            self._pnl_tokens = frozenset(df_filtered['TradingSymbol_Token'].str.rsplit('_', n=1).str[-1])
+            self._pnl_orders_df = df
+        return self._pnl_tokens
+
     def intra_day_pnl (self):
         mtm = 0.0
         df = self.bku.fetch_order_id()
         if df is None or df.empty:
             return mtm
         try:
-            # Some times partial orders are filled. In such cases also, it should be tracked. 
-            df_filtered = df[(df['Qty'] != 0) & ((df['Status'] == 'SUCCESS')| (df['Status'] == 'SOFT_FAILURE_QTY'))].copy()
-            df_filtered['token'] = df_filtered['TradingSymbol_Token'].str.split('_').str[-1]
-            unique_tokens_df = df_filtered[['token']].drop_duplicates()
+            tokens = self._traded_tokens(df)
         except Exception:
             # logger.info('No position to Square off')
             return
@@ -1047,20 +1217,13 @@ class PFMU:
             r = self.tiu.get_positions()
             if r is not None and isinstance(r, list):
                 try:
-                    posn_df = pd.DataFrame(r)
-                    posn_df = posn_df.loc[(posn_df['prd'] == 'I')]
-
-                    merged_df = posn_df.merge(unique_tokens_df[['token']], on='token', how='inner')
-                    merged_df.loc[merged_df['prd'] == 'I', 'urmtom'] = merged_df.loc[merged_df['prd'] == 'I', 'urmtom'].apply(lambda x: locale.atof(x))
-
-                    # Use .loc to filter rows and update the 'rpnl' column
-                    merged_df.loc[merged_df['prd'] == 'I', 'rpnl'] = merged_df.loc[merged_df['prd'] == 'I', 'rpnl'].apply(lambda x: locale.atof(x))
-
-                    # Filter the DataFrame for 'prd' == 'I' again to calculate the sums
-                    mtm_df = merged_df.loc[merged_df['prd'] == 'I']
-
-                    urmtom = mtm_df['urmtom'].sum()
-                    pnl = mtm_df['rpnl'].sum()
+                    urmtom = 0.0
+                    pnl = 0.0
+                    # Broker amounts are strings that may carry thousands separators
+                    for posn in r:
+                        if posn['prd'] == 'I' and posn['token'] in tokens:
+                            urmtom += float(posn['urmtom'].replace(',', ''))
+                            pnl += float(posn['rpnl'].replace(',', ''))
                     mtm = round(urmtom + pnl, 2)
                 except Exception as e:
                     logger.debug (f'Exception occured {str(e)}')
@@ -1081,7 +1244,13 @@ class PFMU:
             self.max_pnl = None
             logger.debug (f'Manual -> Auto  : Reset Done')
 
-        pnl = self.intra_day_pnl()
+        if atd is None and self.manual_pnl_cnt > 1 and self.last_pnl is not None:
+            # In Manual mode the pnl is only displayed; refresh it every few polls
+            self.manual_pnl_cnt -= 1
+            pnl = self.last_pnl
+        else:
+            self.manual_pnl_cnt = PFMU.MANUAL_PNL_REFRESH_COUNT
+            pnl = self.last_pnl = self.intra_day_pnl()
         ate = AutoTrailerEvent (pnl=pnl)
 
         if self.mov_to_cost_state == MOVE_TO_COST_STATE.WAITING_DOWN_CROSS:
@@ -56,7 +56,7 @@ class PMU_State(Enum):
     STOPPED=4
     ERROR=5
 
-@dataclass
+@dataclass(slots=True)
 class WaitConditionData:
     cb_id: str
     condition_fn: callable
@@ -163,13 +163,24 @@ class PriceMonitoringUnit:
     def register_callback(self, token:str, cond_obj):
         with self.lock:
             self.conditions[token].append(cond_obj)
-            logger.debug(f'Token: {token} Registered: {cond_obj.cb_id} {cond_obj} no.of conditions: {len(self.conditions[token])}')
+            logger.debug('Token: %s Registered: %s %s no.of conditions: %s', token, cond_obj.cb_id, cond_obj, len(self.conditions[token]))
 
     def unregister_callback(self, token:str, callback_id):
         if token:
             with self.lock:
                 self.conditions[token] = [cond_ds for cond_ds in self.conditions[token] if cond_ds.cb_id != callback_id]
-                logger.debug(f'Token: {token} Un Registered: {callback_id}')
+                logger.debug('Token: %s Un Registered: %s', token, callback_id)
+
+    def unregister_callbacks_batch(self, pairs:list[tuple[str, str]]):
+        cb_ids_by_token = defaultdict(set)
+        for token, callback_id in pairs:
+            if token:
+                cb_ids_by_token[token].add(callback_id)
+        if cb_ids_by_token:
+            with self.lock:
+                for token, cb_ids in cb_ids_by_token.items():
+                    self.conditions[token] = [cond_ds for cond_ds in self.conditions[token] if cond_ds.cb_id not in cb_ids]
+                    logger.debug('Token: %s Un Registered: %s', token, sorted(cb_ids))
 
     def hard_exit (self):
         logger.debug (f'Hard Exit Begin..')
@@ -260,7 +271,7 @@ class PriceMonitoringUnit:
                                 logger.error("Exception during queue read"+str(e))
                             else :
                                 if log_proc:
-                                    logger.debug (f'processing : {ohlc.tk}:  {ohlc.ft}')
+                                    logger.debug ('processing : %s:  %s', ohlc.tk, ohlc.ft)
                                     log_proc = False
                                 token = str(ohlc.tk)
                                 unix_epoch_time = int(time.time())
@@ -280,41 +291,45 @@ class PriceMonitoringUnit:
                                     else :
                                         drop_tick = False
                                         self.delay_cb_done = False
+                                    # Most ticks carry no waiting condition; skip the lock for those.
+                                    if not self.conditions.get(token):
+                                        continue
                                     with self.lock:
                                         try:
                                             conditions = self.conditions[token]
                                         except Exception as e:
                                             logger.debug (f'Exception occured: {str(e)}')
                                         else :
-                                            rem_list = []
-                                            ltp_level = round(ohlc.c * self.prec_factor)
-                                            # Going through a copy of list
-                                            for cond_elem in conditions:
-                                                cond_obj:WaitConditionData = cond_elem
-                                                if drop_tick:
+                                            ltp_level = int(ohlc.c * self.prec_factor + 0.5)
+                                            if drop_tick:
+                                                for cond_obj in conditions:
                                                     cond_obj.prev_tick_lvl = ltp_level
-                                                    continue
-
-                                                prev_tick_lvl = cond_obj.prev_tick_lvl
-                                                fn = None  
-                                                if prev_tick_lvl is not None:
-                                                    if prev_tick_lvl < cond_obj.wait_price_lvl and ltp_level >= cond_obj.wait_price_lvl:
-                                                        fn = cond_obj.callback_function
-                                                        logger.debug (f'{cond_obj.cb_id}: prev_tick_lvl: {prev_tick_lvl} wait_price_lvl: {cond_obj.wait_price_lvl} ltp_level: {ltp_level} Triggered ft: {ohlc.ft}')
-                                                    if fn is None and prev_tick_lvl > cond_obj.wait_price_lvl and ltp_level <= cond_obj.wait_price_lvl:
-                                                        fn = cond_obj.callback_function
-                                                        logger.debug (f'{cond_obj.cb_id}: prev_tick_lvl: {cond_obj.prev_tick_lvl} wait_price_lvl: {cond_obj.wait_price_lvl} ltp_level: {ltp_level} Triggered ft: {ohlc.ft}')
-                                                if fn is not None:
-                                                    fn(cond_obj.cb_id, ohlc.ft)
-                                                    rem_list.append(cond_obj)
-                                                else:
+                                            else:
+                                                # Single pass: triggered conditions fire and are dropped,
+                                                # the rest move their previous level on and are kept.
+                                                kept_list = []
+                                                for cond_elem in conditions:
+                                                    cond_obj:WaitConditionData = cond_elem
+                                                    prev_tick_lvl = cond_obj.prev_tick_lvl
+                                                    wait_price_lvl = cond_obj.wait_price_lvl
+                                                    if prev_tick_lvl is not None:
+                                                        # Crossed (or touched) the wait level from either side:
+                                                        # the previous tick was off the level and this tick is
+                                                        # on it or on the other side.
+                                                        d_prev = prev_tick_lvl - wait_price_lvl
+                                                        if d_prev and d_prev * (ltp_level - wait_price_lvl) <= 0:
+                                                            logger.debug ('%s: prev_tick_lvl: %s wait_price_lvl: %s ltp_level: %s Triggered ft: %s',
+                                                                          cond_obj.cb_id, prev_tick_lvl, wait_price_lvl, ltp_level, ohlc.ft)
+                                                            cond_obj.callback_function(cond_obj.cb_id, ohlc.ft)
+                                                            continue
                                                     cond_obj.prev_tick_lvl = ltp_level
+                                                    kept_list.append(cond_obj)
 
-                                            if len(rem_list):
-                                                self.conditions[token] = [cond_obj for cond_obj in conditions if cond_obj not in rem_list]
-                                                logger.info (f'Updated list : {len(self.conditions[token])}')
-                                                for condition in self.conditions[token]:
-                                                    logger.debug(condition)
+                                                if len(kept_list) != len(conditions):
+                                                    self.conditions[token] = kept_list
+                                                    logger.info (f'Updated list : {len(kept_list)}')
+                                                    for condition in kept_list:
+                                                        logger.debug(condition)
                             finally :
                                 nelem -= 1
                 else :
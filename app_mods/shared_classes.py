@@ -75,7 +75,7 @@ class UI_State(Enum):
     ENABLE = 1
 
 
-@dataclass
+@dataclass(slots=True)
 class Order:
     seq_num: int
     buy_or_sell: str
@@ -174,7 +174,7 @@ class OCO_BaseOrder ():
             self._oco_remarks = re.sub("[-,&]+", "_", self._oco_remarks)
 
 
-@dataclass
+@dataclass(slots=True)
 class I_B_MKT_Order(Order):
     # Initialize default values using default_factory to avoid sharing mutable defaults
     seq_num: int = field(default=1, init=False)
@@ -184,7 +184,7 @@ class I_B_MKT_Order(Order):
     price: float = field(default=0.0, init=False)
 
 
-@dataclass
+@dataclass(slots=True)
 class I_S_MKT_Order(Order):
     # Initialize default values using default_factory to avoid sharing mutable defaults
     seq_num: int = field(default=1, init=False)
@@ -197,9 +197,9 @@ class I_S_MKT_Order(Order):
 @dataclass
 class BO_B_SL_LMT_Order(Order):
     # Define only attributes that differ or need specific modification
-    trigger_price: float
-    book_loss_price: float
-    book_profit_price: float
+    trigger_price: float = None
+    book_loss_price: float = None
+    book_profit_price: float = None
 
     # Initialize default values using default_factory to avoid sharing mutable defaults
     buy_or_sell: str = field(default='B', init=False)
@@ -217,8 +217,8 @@ class BO_B_SL_LMT_Order(Order):
 @dataclass
 class BO_B_LMT_Order(Order):
     # Define only attributes that differ or need specific modification
-    book_loss_price: float
-    book_profit_price: float
+    book_loss_price: float = None
+    book_profit_price: float = None
 
     # Initialize default values using default_factory to avoid sharing mutable defaults
     buy_or_sell: str = field(default='B', init=False)
@@ -231,11 +231,11 @@ class BO_B_LMT_Order(Order):
             self.discloseqty = int(self.quantity * 0.12)
 
 
-@dataclass
+@dataclass(slots=True)
 class BO_B_MKT_Order(Order):
     # Define only attributes that differ or need specific modification
-    book_loss_price: float
-    book_profit_price: float
+    book_loss_price: float = None
+    book_profit_price: float = None
 
     # Initialize default values using default_factory to avoid sharing mutable defaults
     seq_num: int = field(default=1, init=False)
@@ -250,11 +250,11 @@ class BO_B_MKT_Order(Order):
             self._remarks = re.sub("[-,&]+", "_", self.bo_remarks)
 
 
-@dataclass
+@dataclass(slots=True)
 class BO_S_MKT_Order(Order):
     # Define only attributes that differ or need specific modification
-    book_loss_price: float
-    book_profit_price: float
+    book_loss_price: float = None
+    book_profit_price: float = None
 
     # Initialize default values using default_factory to avoid sharing mutable defaults
     seq_num: int = field(default=1, init=False)
@@ -306,6 +306,8 @@ class OCO_FOLLOW_UP_MKT_I_Order(Order):
 
 
 class Combi_Primary_B_MKT_And_OCO_S_MKT_I_Order_NSE:
+    __slots__ = ('primary_order', 'follow_up_order')
+
     def __init__(self, tradingsymbol, quantity, bl_alert_p: float = None, bp_alert_p: float = None, remarks: str = None):
         if remarks:
             remarks = re.sub("[-,&]+", "_", remarks)
@@ -374,6 +376,8 @@ class Combi_Primary_B_MKT_And_OCO_S_MKT_I_Order_NSE:
 
 
 class Combi_Primary_S_MKT_And_OCO_B_MKT_I_Order_NSE:
+    __slots__ = ('primary_order', 'follow_up_order')
+
     def __init__(self, tradingsymbol, quantity, bl_alert_p: float = None, bp_alert_p: float = None, remarks: str = None):
         if remarks:
             remarks = re.sub("[-,&]+", "_", remarks)
@@ -442,6 +446,8 @@ class Combi_Primary_S_MKT_And_OCO_B_MKT_I_Order_NSE:
 
 
 class Combi_Primary_B_MKT_And_OCO_S_MKT_I_Order_NFO (Combi_Primary_B_MKT_And_OCO_S_MKT_I_Order_NSE):
+    __slots__ = ()
+
     def __init__(self, tradingsymbol, quantity, bl_alert_p: float = None, bp_alert_p: float = None, remarks: str = None):
         super().__init__(tradingsymbol, quantity, bl_alert_p, bp_alert_p, remarks)
         self.__post_init__()
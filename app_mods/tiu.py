@@ -31,6 +31,7 @@ try:
     import datetime
     import json
     import locale
+    import logging
     import os
     import re
     import time
@@ -257,7 +258,8 @@ class BaseIU (object):
     def fetch_ltp(self, exchange: str, token: str):
         fv = self.fv
         quote = fv.get_quotes(exchange=exchange, token=token)
-        logger.debug(f'exchange:{exchange} token:{token} {json.dumps(quote,indent=2)}')
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f'exchange:{exchange} token:{token} {json.dumps(quote,indent=2)}')
         if quote and 'c' in quote and 'ti' in quote and 'ls' in quote:
             return float(quote['lp']), float(quote['ti']), int(quote['ls'])
         else:
@@ -874,7 +876,7 @@ class Tiu (BaseIU):
                isinstance(order, shared_classes.Combi_Primary_S_MKT_And_OCO_B_MKT_I_Order_NSE):
                order = order.primary_order
 
-            logger.debug(f'placing {order.buy_or_sell} order {order}')
+            logger.debug('placing %s order %s', order.buy_or_sell, order)
             r = self.fv.place_order(buy_or_sell=order.buy_or_sell,
                                     product_type=order.product_type,
                                     exchange=order.exchange,
@@ -30,8 +30,8 @@ import app_utils
 logger = app_utils.get_logger(__name__)
 
 try:
-    import copy
     import json
+    from dataclasses import replace
     from datetime import datetime, date
     from sre_constants import FAILURE, SUCCESS
     from threading import Lock
@@ -310,8 +310,7 @@ class WS_WrapU(object):
                             fv_send_data = self._fv_send_data
 
                         if self._send_data and fv_send_data:
-                            new_obj:TickData = copy.copy(ohlc_obj)
-                            new_obj.rx_ts = str(time())
+                            new_obj:TickData = replace(ohlc_obj, rx_ts=str(time()))
                             # Avoiding a call to a function : self.port.send_data(new_obj)  
                             self.port.data_q.put (new_obj)
                             self.port.evt.set()